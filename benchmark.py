@@ -0,0 +1,241 @@
+"""Benchmarks of the construction of the geometry.
+
+Each case is run in a fresh process and its wall time, peak RSS and the
+number of faces of the resulting solids are written to a JSON file. The
+results can be compared against a baseline file:
+
+    python benchmark.py --quick --save-baseline
+    python benchmark.py --quick --baseline benchmark_baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+import cadquery
+
+import create_geometry
+from monoblock import Monoblock
+from pfu import PFU, MATERIALS
+from target import Target
+
+MB_ARGS = dict(
+    thickness=1.2,
+    height=2.5,
+    width=2.3,
+    cucrzr_inner_radius=0.6,
+    cucrzr_thickness=0.15,
+    w_thickness=0.5,
+    cu_thickness=0.1,
+    gap=0.1,
+)
+
+PFU_ARGS = dict(L=87.0, target_radius=25.0, angle=80, nb_mbs_on_curve=27, **MB_ARGS)
+
+
+def bench_monoblock(**kwargs):
+    my_mb = Monoblock(**dict(MB_ARGS, **kwargs))
+    return {
+        "tungsten": my_mb.tungsten,
+        "copper": my_mb.copper,
+        "cucrzr": my_mb.cucrzr,
+    }
+
+
+def bench_pfu(**kwargs):
+    my_pfu = PFU(**dict(PFU_ARGS, **kwargs))
+    my_pfu.make_solid()
+    return {material: my_pfu.get(material) for material in MATERIALS}
+
+
+def bench_target(**kwargs):
+    my_target = Target(toroidal_gap=0.2, **dict(PFU_ARGS, **kwargs))
+    my_target.build()
+    return {material: my_target.get(material) for material in MATERIALS}
+
+
+def bench_stage(stage):
+    tungsten, copper, cucrzr, water = getattr(create_geometry, stage)()
+    return {"tungsten": tungsten, "copper": copper, "cucrzr": cucrzr, "water": water}
+
+
+def cases(quick=False):
+    """Lists the benchmark cases
+    Args:
+        quick (bool, optional): if True, only a small subset of the cases is
+            listed. Defaults to False.
+    Returns:
+        dict: (function, kwargs) of each case name
+    """
+    # the lengths are multiples of thickness + gap (1.3 mm) and there are at
+    # most 27 monoblocks on the curve (see placement.nb_monoblocks_on_curve)
+    # so that the monoblocks don't intersect
+    if quick:
+        nbs_mbs_on_curve = [5, 10]
+        lengths = [0, 10.4]
+        nbs_pfus = [1, 2]
+    else:
+        nbs_mbs_on_curve = [7, 14, 27]
+        lengths = [0, 44.2, 88.4]
+        nbs_pfus = [1, 3, 5]
+
+    all_cases = {
+        "monoblock": (bench_monoblock, {}),
+        "monoblock_extrude": (bench_monoblock, dict(method="extrude")),
+    }
+    for nb_mbs_on_curve in nbs_mbs_on_curve:
+        for L in lengths:
+            name = "pfu_L{}_curve{}".format(L, nb_mbs_on_curve)
+            all_cases[name] = (bench_pfu, dict(L=L, nb_mbs_on_curve=nb_mbs_on_curve))
+    for nb_pfus in nbs_pfus:
+        kwargs = dict(nb_pfus=nb_pfus)
+        if quick:
+            kwargs.update(L=lengths[-1], nb_mbs_on_curve=nbs_mbs_on_curve[-1])
+        all_cases["target_nb_pfus{}".format(nb_pfus)] = (bench_target, kwargs)
+    if not quick:
+        for stage in ["make_inner_target", "make_outer_target", "make_dome"]:
+            all_cases[stage] = (bench_stage, dict(stage=stage))
+    return all_cases
+
+
+def run_case(name, quick, connection):
+    """Runs a case and sends its results through a pipe, to be run in a
+    fresh process"""
+    function, kwargs = cases(quick)[name]
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        start = time.perf_counter()
+        solids = function(**kwargs)
+        wall_time = time.perf_counter() - start
+    except Exception as e:
+        connection.send({"status": "error", "error": repr(e)})
+        return
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    faces = {
+        material: sum(len(obj.Faces()) for obj in solid.vals())
+        for material, solid in solids.items()
+    }
+    connection.send(
+        {
+            "status": "ok",
+            "wall_time": wall_time,
+            # ru_maxrss is in kB on Linux
+            "peak_rss_mb": peak_rss / 1024,
+            "rss_delta_mb": (peak_rss - start_rss) / 1024,
+            "faces": faces,
+        }
+    )
+
+
+def run(quick=False, selection=None):
+    """Runs the benchmark cases, each of them in a fresh process
+    Args:
+        quick (bool, optional): if True, only runs a small subset of the
+            cases. Defaults to False.
+        selection (list, optional): names of the cases to run.
+            Defaults to None (all the cases).
+    Returns:
+        dict: the results
+    """
+    # the cache would make the benchmarks meaningless
+    os.environ["PFU_GEOMETRY_NO_CACHE"] = "1"
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in cases(quick):
+        if selection and name not in selection:
+            continue
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_case, args=(name, quick, sender))
+        process.start()
+        result = receiver.recv() if receiver.poll(None) else None
+        process.join()
+        if result is None:
+            result = {"status": "error", "error": "process died"}
+        results[name] = result
+        if result["status"] == "ok":
+            print("{}: {:.2f} s".format(name, result["wall_time"]))
+        else:
+            print("{}: {}".format(name, result["error"]))
+
+    return {
+        "environment": {
+            "python": sys.version.split()[0],
+            "cadquery": cadquery.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "quick": quick,
+        "cases": results,
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Compares results against a baseline
+    Args:
+        results (dict): the results
+        baseline (dict): the baseline results
+        tolerance (float, optional): relative increase of wall time or peak
+            RSS above which a case is considered as a regression.
+            Defaults to 0.25.
+    Returns:
+        list: description of each regression
+    """
+    regressions = []
+    for name, result in results["cases"].items():
+        reference = baseline["cases"].get(name)
+        if reference is None or reference["status"] != "ok":
+            continue
+        if result["status"] != "ok":
+            regressions.append("{}: {}".format(name, result["error"]))
+            continue
+        for quantity in ["wall_time", "peak_rss_mb"]:
+            ratio = result[quantity] / reference[quantity]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    "{}: {} {:.3g} -> {:.3g} (x{:.2f})".format(
+                        name, quantity, reference[quantity], result[quantity], ratio
+                    )
+                )
+        if result["faces"] != reference["faces"]:
+            regressions.append(
+                "{}: faces {} -> {}".format(name, reference["faces"], result["faces"])
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", nargs="*", help="names of the cases to run")
+    parser.add_argument("--quick", action="store_true", help="small cases only")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="baseline file to compare against")
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const="benchmark_baseline.json",
+        help="save the results as the baseline",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run(quick=args.quick, selection=args.cases)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print("no regression")
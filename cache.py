@@ -0,0 +1,149 @@
+import cadquery as cq
+
+from io import BytesIO
+import hashlib
+import json
+import os
+import shutil
+
+# to be incremented when a change in the construction of the geometry makes
+# the cached solids obsolete
+CACHE_VERSION = 2
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "pfu_geometry")
+
+
+class GeometryCache:
+    def __init__(self, directory=None, max_size=2e9, enabled=None) -> None:
+        """On-disk cache of solids stored in binary BREP, keyed by a hash of
+        the arguments used to build them. The least recently used entries
+        are removed when the cache exceeds max_size.
+        Args:
+            directory (str, optional): directory of the cache. Defaults to the
+                PFU_GEOMETRY_CACHE environment variable or
+                ~/.cache/pfu_geometry.
+            max_size (float, optional): maximum size of the cache (bytes).
+                Defaults to 2e9.
+            enabled (bool, optional): if False, the cache is bypassed.
+                Defaults to False if the PFU_GEOMETRY_NO_CACHE environment
+                variable is set, True otherwise.
+        """
+        if directory is None:
+            directory = os.environ.get("PFU_GEOMETRY_CACHE", DEFAULT_DIRECTORY)
+        if enabled is None:
+            enabled = os.environ.get("PFU_GEOMETRY_NO_CACHE", "") in ["", "0"]
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+
+    def key(self, kind, parameters):
+        """Computes the key of an entry
+        Args:
+            kind (str): kind of object (eg. "Monoblock")
+            parameters (dict): arguments used to build the object
+        Returns:
+            str: the key
+        """
+        content = json.dumps(
+            {"version": CACHE_VERSION, "kind": kind, "parameters": parameters},
+            sort_keys=True,
+            default=repr,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def load(self, key, names):
+        """Loads the solids of an entry
+        Args:
+            key (str): key of the entry
+            names (list): names of the solids (eg. ["tungsten", "copper"])
+        Returns:
+            dict: the workplane of each name, None if the cache is disabled
+                or if the entry doesn't exist
+        """
+        if not self.enabled:
+            return None
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry):
+            return None
+
+        solids = {}
+        for name in names:
+            files = sorted(
+                (f for f in os.listdir(entry) if f.rsplit("_", 1)[0] == name),
+                key=lambda f: int(f.rsplit("_", 1)[1].split(".")[0]),
+            )
+            if len(files) == 0:
+                return None
+            shapes = []
+            for filename in files:
+                with open(os.path.join(entry, filename), "rb") as f:
+                    shapes.append(cq.Shape.importBin(BytesIO(f.read())))
+            solids[name] = cq.Workplane("XY").add(shapes)
+
+        # mark the entry as recently used
+        os.utime(entry)
+        return solids
+
+    def save(self, key, solids):
+        """Saves solids in an entry and evicts the least recently used
+        entries if needed
+        Args:
+            key (str): key of the entry
+            solids (dict): the workplane of each name
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = os.path.join(self.directory, key)
+        # write in a temporary directory first so that an interrupted write
+        # doesn't leave an incomplete entry
+        tmp_entry = "{}.tmp{}".format(entry, os.getpid())
+        os.makedirs(tmp_entry, exist_ok=True)
+        for name, workplane in solids.items():
+            for i, shape in enumerate(workplane.vals()):
+                stream = BytesIO()
+                shape.exportBin(stream)
+                filename = os.path.join(tmp_entry, "{}_{}.brep".format(name, i))
+                with open(filename, "wb") as f:
+                    f.write(stream.getvalue())
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # the same entry was saved concurrently by another process
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """Lists the entries of the cache
+        Returns:
+            list: (last access time, size in bytes, path) of each entry
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = os.path.join(self.directory, key)
+            if not os.path.isdir(entry) or ".tmp" in key:
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry)
+            )
+            entries.append((os.path.getmtime(entry), size, entry))
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries until the size of the
+        cache is below max_size"""
+        entries = sorted(self.entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        """Removes all the entries of the cache"""
+        for _, _, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
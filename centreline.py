@@ -0,0 +1,128 @@
+import cadquery as cq
+from OCP.BRepOffsetAPI import BRepOffsetAPI_MakePipe
+import numpy as np
+
+
+class Centreline:
+    def __init__(self, segments, start=(0, 0, 0), direction=(0, 1, 0)) -> None:
+        """Path of a cooling tube in the XY plane, made of tangent segments.
+        Args:
+            segments (list): the segments, ("line", length) for a straight
+                segment, ("arc", radius, angle) for an arc of circle (angle
+                in deg, positive if the arc turns anticlockwise) or
+                ("spline", points) for a spline through a list of points,
+                tangent to the previous segment and ending in the direction
+                of its last two points
+            start (tuple, optional): start point of the path.
+                Defaults to (0, 0, 0).
+            direction (tuple, optional): direction of the path at the start
+                point. Defaults to (0, 1, 0).
+        """
+        self.segments = segments
+        self.start = cq.Vector(start)
+        self.direction = cq.Vector(direction).normalized()
+
+    @classmethod
+    def line_arc(cls, L, radius, angle):
+        """Creates the centreline of a PFU: a straight part along Y followed
+        by an arc turning towards X
+        Args:
+            L (float): length of the straight part (mm)
+            radius (float): radius of the arc (mm)
+            angle (float): angle of the arc (deg)
+        Returns:
+            Centreline: the centreline
+        """
+        segments = [("arc", radius, -angle)]
+        if L != 0:
+            segments.insert(0, ("line", L))
+        return cls(segments)
+
+    def edges(self):
+        """Creates the edges of the path
+        Returns:
+            list: the cq.Edge of each segment
+        """
+        point, direction = self.start, self.direction
+        edges = []
+        for segment in self.segments:
+            kind = segment[0]
+            if kind == "line":
+                end = point + direction * segment[1]
+                edge = cq.Edge.makeLine(point, end)
+                end_direction = direction
+            elif kind == "arc":
+                radius, angle = segment[1], segment[2]
+                # normal to the direction in the XY plane, towards the centre
+                side = np.sign(angle) * cq.Vector(-direction.y, direction.x, 0)
+                centre = point + side * radius
+                mid = _rotate(point, centre, angle / 2)
+                end = _rotate(point, centre, angle)
+                edge = cq.Edge.makeThreePointArc(point, mid, end)
+                end_direction = _rotate(direction, cq.Vector(), angle)
+            elif kind == "spline":
+                points = [point] + [cq.Vector(p) for p in segment[1]]
+                end = points[-1]
+                end_direction = (end - points[-2]).normalized()
+                edge = cq.Edge.makeSpline(points, tangents=[direction, end_direction])
+            else:
+                raise ValueError("unknown segment {}".format(kind))
+            edges.append(edge)
+            point, direction = end, end_direction.normalized()
+        return edges
+
+    def wire(self):
+        """Creates the wire of the path
+        Returns:
+            cq.Wire: the wire
+        """
+        return cq.Wire.assembleEdges(self.edges())
+
+    def length(self):
+        """Computes the length of the path
+        Returns:
+            float: the length (mm)
+        """
+        return sum(edge.Length() for edge in self.edges())
+
+    def sweep(self, outer_radius, inner_radius=None):
+        """Sweeps a disc or an annulus along the path in a single operation.
+        The profile is kept normal to the path, which is tangent continuous.
+        Args:
+            outer_radius (float): outer radius of the profile (mm)
+            inner_radius (float, optional): inner radius of the profile (mm).
+                Defaults to None (disc).
+        Raises:
+            RuntimeError: if the sweep fails
+        Returns:
+            cq.Workplane: the swept solid
+        """
+        holes = []
+        if inner_radius is not None:
+            holes.append(cq.Wire.makeCircle(inner_radius, self.start, self.direction))
+        profile = cq.Face.makeFromWires(
+            cq.Wire.makeCircle(outer_radius, self.start, self.direction), holes
+        )
+        # BRepOffsetAPI_MakePipe is much faster than the pipe shell used by
+        # cq.Workplane.sweep, which handles non tangent paths
+        pipe = BRepOffsetAPI_MakePipe(self.wire().wrapped, profile.wrapped)
+        pipe.Build()
+        if not pipe.IsDone():
+            raise RuntimeError("sweep operation failed")
+        return cq.Workplane("XY").add(cq.Shape.cast(pipe.Shape()))
+
+
+def _rotate(vector, centre, angle):
+    """Rotates a vector around an axis parallel to Z
+    Args:
+        vector (cq.Vector): the vector
+        centre (cq.Vector): a point of the axis
+        angle (float): angle of the rotation (deg)
+    Returns:
+        cq.Vector: the rotated vector
+    """
+    x, y = vector.x - centre.x, vector.y - centre.y
+    cos, sin = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    return cq.Vector(
+        centre.x + cos * x - sin * y, centre.y + sin * x + cos * y, vector.z
+    )
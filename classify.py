@@ -0,0 +1,168 @@
+import numpy as np
+
+from monoblock import centre_offset
+from transforms import location_to_matrix
+
+# material ids returned by MaterialClassifier.classify, 0 being outside
+MATERIAL_IDS = {"tungsten": 1, "copper": 2, "tube": 3, "water": 4}
+
+
+def centreline_abscissa(points, L, target_radius):
+    """Computes the curvilinear abscissa of the projection of points on the
+    centreline of a PFU (see PFU.centreline_abscissa)
+    Args:
+        points (np.ndarray): (N, 3) points
+        L (float): length of the straight part of the PFU (mm)
+        target_radius (float): radius of the curved part of the PFU (mm)
+    Returns:
+        np.ndarray: (N,) abscissas (mm), 0 being the start of the straight
+            part
+    """
+    x, y = points[:, 0], points[:, 1]
+    theta = np.arctan2(y - L, x - target_radius)
+    return np.where(y <= L, y, L + target_radius * (np.pi - theta))
+
+
+def centreline_distance(points, L, target_radius, angle):
+    """Computes the distance of points to the centreline of a PFU, a
+    straight segment along Y followed by an arc turning towards X. Points
+    beyond the end planes of the tube are at an infinite distance.
+    Args:
+        points (np.ndarray): (N, 3) points
+        L (float): length of the straight part of the PFU (mm)
+        target_radius (float): radius of the curved part of the PFU (mm)
+        angle (float): angle of the curved part of the PFU (deg)
+    Returns:
+        np.ndarray: (N,) distances (mm)
+    """
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    straight = np.where((y >= 0) & (y <= L), np.hypot(x, z), np.inf)
+
+    theta = np.arctan2(y - L, x - target_radius)
+    radius = np.hypot(x - target_radius, y - L)
+    on_arc = (theta >= np.pi - np.radians(angle)) & (y >= L)
+    curved = np.where(on_arc, np.hypot(radius - target_radius, z), np.inf)
+    return np.minimum(straight, curved)
+
+
+class MaterialClassifier:
+    def __init__(self, obj) -> None:
+        """Analytic point classifier of a PFU or a Target, built from the
+        placements of the monoblocks and the parameters of the tube without
+        building any geometry. The monoblocks of a PFU are ordered along its
+        centreline: they are indexed by the abscissa of their location so
+        that each point is only tested against the two monoblocks around
+        its own abscissa (binary search). The PFU of a point of a target is
+        found from its toroidal coordinate.
+        Args:
+            obj (PFU or Target): the PFU or Target
+        """
+        matrix = np.eye(4)
+        if hasattr(obj, "nb_pfus"):
+            pfu = obj.base_pfu
+            self.nb_pfus = obj.nb_pfus
+            self.pitch = obj.pfu_args["width"] + obj.toroidal_gap
+            if obj.location is not None:
+                matrix = location_to_matrix(obj.location)
+        else:
+            pfu = obj
+            self.nb_pfus = 1
+            self.pitch = 0
+            if pfu.source is not None:
+                matrix[:3, 3] = tuple(pfu.source[1])
+        self.inverse_matrix = np.linalg.inv(matrix)
+
+        self.L = pfu.L
+        self.target_radius = pfu.target_radius
+        self.angle = pfu.angle
+        self.water_radius = pfu.monoblocks_args["cucrzr_inner_radius"]
+        self.tube_radius = self.water_radius + pfu.monoblocks_args["cucrzr_thickness"]
+
+        placements = pfu.monoblock_placements()
+
+        def parameter(name):
+            return np.array([placement[name] for placement in placements])
+
+        self.locations = parameter("location").reshape(-1, 3)
+        self.normals = parameter("normal").reshape(-1, 3)
+        self.normals /= np.linalg.norm(self.normals, axis=1)[:, None]
+        self.x_dirs = parameter("xDir").reshape(-1, 3)
+        self.y_dirs = np.cross(self.normals, self.x_dirs)
+        self.thickness = parameter("thickness")
+        self.height = parameter("height")
+        self.width = parameter("width")
+        self.offset = np.array([centre_offset(**placement) for placement in placements])
+        self.copper_radius = (
+            parameter("cucrzr_inner_radius")
+            + parameter("cucrzr_thickness")
+            + parameter("cu_thickness")
+        )
+        self.abscissas = centreline_abscissa(self.locations, self.L, self.target_radius)
+
+    def to_pfu_frame(self, points):
+        """Moves points to the frame of the base PFU
+        Args:
+            points (np.ndarray): (N, 3) points
+        Returns:
+            np.ndarray, np.ndarray: the (N, 3) moved points and the (N,)
+                index of the PFU of each point
+        """
+        points = points @ self.inverse_matrix[:3, :3].T + self.inverse_matrix[:3, 3]
+        if self.nb_pfus == 1:
+            return points, np.zeros(len(points), dtype=int)
+        # the PFUs are translated by -i * pitch along Z
+        indices = np.clip(np.rint(-points[:, 2] / self.pitch), 0, self.nb_pfus - 1)
+        indices = indices.astype(int)
+        points[:, 2] += indices * self.pitch
+        return points, indices
+
+    def classify(self, points):
+        """Classifies points
+        Args:
+            points (np.ndarray): (N, 3) points
+        Returns:
+            np.ndarray, np.ndarray, np.ndarray: the (N,) material id (see
+                MATERIAL_IDS, 0 outside the materials), index of the PFU and
+                index of the monoblock in its PFU (-1 if the point is not in
+                a monoblock) of each point
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        points, pfu_indices = self.to_pfu_frame(points)
+
+        materials = np.zeros(len(points), dtype=int)
+        monoblock_indices = np.full(len(points), -1)
+
+        distances = centreline_distance(points, self.L, self.target_radius, self.angle)
+        in_tube = distances <= self.tube_radius
+        materials[distances <= self.water_radius] = MATERIAL_IDS["water"]
+        materials[in_tube & (materials == 0)] = MATERIAL_IDS["tube"]
+
+        abscissas = centreline_abscissa(points, self.L, self.target_radius)
+        after = np.searchsorted(self.abscissas, abscissas)
+        for candidates in [after - 1, after]:
+            valid = (candidates >= 0) & (candidates < len(self.abscissas))
+            valid &= materials == 0
+            i = candidates[valid]
+            delta = points[valid] - self.locations[i]
+            u = np.einsum("nj,nj->n", delta, self.x_dirs[i])
+            v = np.einsum("nj,nj->n", delta, self.y_dirs[i])
+            w = np.einsum("nj,nj->n", delta, self.normals[i])
+
+            in_thickness = np.abs(w) <= self.thickness[i] / 2
+            in_copper = in_thickness & (np.hypot(u, v) <= self.copper_radius[i])
+            in_tungsten = (
+                in_thickness
+                & ~in_copper
+                & (np.abs(u) <= self.width[i] / 2)
+                & (np.abs(v - self.offset[i]) <= self.height[i] / 2)
+            )
+
+            material = np.zeros(len(i), dtype=int)
+            material[in_copper] = MATERIAL_IDS["copper"]
+            material[in_tungsten] = MATERIAL_IDS["tungsten"]
+            indices = np.flatnonzero(valid)
+            materials[indices] = material
+            monoblock_indices[indices[material > 0]] = i[material > 0]
+
+        pfu_indices = np.where(materials > 0, pfu_indices, -1)
+        return materials, pfu_indices, monoblock_indices
@@ -1,17 +1,22 @@
-from paramak import (
-    Reactor,
-    Shape,
-    Plasma,
-    ITERtypeDivertor,
+import numpy as np
+from target import Target
+from divertor import Divertor
+from cache import GeometryCache
+from helpers import (
     find_center_point_of_circle,
     find_radius_of_circle,
     angle_between_two_points_on_circle,
 )
-import numpy as np
-from target import Target
-import cadquery as cq
+from tracing import stage, add_hook, print_event, TraceRecorder
+from transforms import rotation, translation
 import os
 
+# if False, the monoblocks, PFUs and components are not fused together and
+# the materials are compounds of the individual bodies
+FUSE = True
+# number of worker processes building the components, -1 meaning all the CPUs
+N_JOBS = -1
+
 
 def make_dome():
     dome_length = 66
@@ -42,57 +47,18 @@ def make_dome():
         cucrzr_thickness=0.15,
         w_thickness=0.5,
         cu_thickness=0.1,
+        fuse=FUSE,
+        cache=GeometryCache(),
     )
 
-    dome_tungsten = Shape()
-    dome_tungsten.solid = dome.tungsten
-    dome_tungsten.rotation_axis = "X"
-    dome_tungsten.workplane = "ZX"
-    dome_tungsten.azimuth_placement_angle = 90
-    dome_tungsten.solid = dome_tungsten.rotate_solid(dome_tungsten.solid)
-
-    dome_tungsten.rotation_axis = "Y"
-    dome_tungsten.azimuth_placement_angle = 85
-    dome_tungsten.solid = dome_tungsten.rotate_solid(dome_tungsten.solid)
-    dome_tungsten.solid = dome_tungsten.solid.translate(cq.Vector(480, 0, -358))
-
-    dome_copper = Shape()
-    dome_copper.solid = dome.copper
-    dome_copper.rotation_axis = "X"
-    dome_copper.workplane = "ZX"
-    dome_copper.azimuth_placement_angle = 90
-    dome_copper.solid = dome_copper.rotate_solid(dome_copper.solid)
-
-    dome_copper.rotation_axis = "Y"
-    dome_copper.azimuth_placement_angle = 85
-    dome_copper.solid = dome_copper.rotate_solid(dome_copper.solid)
-    dome_copper.solid = dome_copper.solid.translate(cq.Vector(480, 0, -358))
-
-    dome_cucrzr = Shape()
-    dome_cucrzr.solid = dome.tube
-    dome_cucrzr.rotation_axis = "X"
-    dome_cucrzr.workplane = "ZX"
-    dome_cucrzr.azimuth_placement_angle = 90
-    dome_cucrzr.solid = dome_cucrzr.rotate_solid(dome_cucrzr.solid)
-
-    dome_cucrzr.rotation_axis = "Y"
-    dome_cucrzr.azimuth_placement_angle = 85
-    dome_cucrzr.solid = dome_cucrzr.rotate_solid(dome_cucrzr.solid)
-    dome_cucrzr.solid = dome_cucrzr.solid.translate(cq.Vector(480, 0, -358))
-
-    dome_water = Shape()
-    dome_water.solid = dome.water
-    dome_water.rotation_axis = "X"
-    dome_water.workplane = "ZX"
-    dome_water.azimuth_placement_angle = 90
-    dome_water.solid = dome_water.rotate_solid(dome_water.solid)
-
-    dome_water.rotation_axis = "Y"
-    dome_water.azimuth_placement_angle = 85
-    dome_water.solid = dome_water.rotate_solid(dome_water.solid)
-    dome_water.solid = dome_water.solid.translate(cq.Vector(480, 0, -358))
+    # rotate around X and Y axes then translate
+    dome.place(
+        translation((480, 0, -358))
+        * rotation((0, -1, 0), (0, 1, 0), 85)
+        * rotation((-1, 0, 0), (1, 0, 0), 90)
+    )
 
-    return dome_tungsten.solid, dome_copper.solid, dome_cucrzr.solid, dome_water.solid
+    return dome.tungsten, dome.copper, dome.tube, dome.water
 
 
 def make_outer_target():
@@ -110,56 +76,16 @@ def make_outer_target():
         cucrzr_thickness=0.15,
         w_thickness=0.5,
         cu_thickness=0.1,
+        fuse=FUSE,
+        cache=GeometryCache(),
     )
-    water = Shape(name="water")
-    water.solid = my_target.water
-
-    tungsten = Shape(name="tungsten")
-    tungsten.solid = my_target.tungsten
-
-    copper = Shape(name="copper")
-    copper.solid = my_target.copper
-
-    cucrzr = Shape(name="cucrzr")
-    cucrzr.solid = my_target.tube
-
-    # rotate pfu around X axis
-    water.rotation_axis = "X"
-    water.workplane = "ZX"
-    water.azimuth_placement_angle = 90
-    water.solid = water.rotate_solid(water.solid)
-
-    tungsten.rotation_axis = "X"
-    tungsten.workplane = "ZX"
-    tungsten.azimuth_placement_angle = 90
-    tungsten.solid = tungsten.rotate_solid(tungsten.solid)
-
-    copper.rotation_axis = "X"
-    copper.workplane = "ZX"
-    copper.azimuth_placement_angle = 90
-    copper.solid = copper.rotate_solid(copper.solid)
-
-    cucrzr.rotation_axis = "X"
-    cucrzr.workplane = "ZX"
-    cucrzr.azimuth_placement_angle = 90
-    cucrzr.solid = cucrzr.rotate_solid(cucrzr.solid)
-
-    # translate pfu
-
-    water.solid = water.solid.translate(
-        cq.Vector(561, 0, -367 - my_target.pfu_args["L"])
-    )
-    tungsten.solid = tungsten.solid.translate(
-        cq.Vector(561, 0, -367 - my_target.pfu_args["L"])
-    )
-    copper.solid = copper.solid.translate(
-        cq.Vector(561, 0, -367 - my_target.pfu_args["L"])
-    )
-    cucrzr.solid = cucrzr.solid.translate(
-        cq.Vector(561, 0, -367 - my_target.pfu_args["L"])
+    # rotate pfu around X axis then translate
+    my_target.place(
+        translation((561, 0, -367 - my_target.pfu_args["L"]))
+        * rotation((-1, 0, 0), (1, 0, 0), 90)
     )
 
-    return tungsten.solid, copper.solid, cucrzr.solid, water.solid
+    return my_target.tungsten, my_target.copper, my_target.tube, my_target.water
 
 
 def make_inner_target():
@@ -177,106 +103,74 @@ def make_inner_target():
         cucrzr_thickness=0.15,
         w_thickness=0.5,
         cu_thickness=0.1,
+        fuse=FUSE,
+        cache=GeometryCache(),
         nb_mbs_on_curve=60,
     )
 
-    my_target.tungsten = my_target.tungsten.rotate((0, 1, 0), (0, -1, 0), 180)
-    my_target.water = my_target.water.rotate((0, 1, 0), (0, -1, 0), 180)
-    my_target.copper = my_target.copper.rotate((0, 1, 0), (0, -1, 0), 180)
-    my_target.tube = my_target.tube.rotate((0, 1, 0), (0, -1, 0), 180)
-    water = Shape(name="water")
-    water.solid = my_target.water
-
-    tungsten = Shape(name="tungsten")
-    tungsten.solid = my_target.tungsten
-
-    copper = Shape(name="copper")
-    copper.solid = my_target.copper
-
-    cucrzr = Shape(name="cucrzr")
-    cucrzr.solid = my_target.tube
-
-    # rotate pfu around X axis
-    water.rotation_axis = "X"
-    water.workplane = "ZX"
-    water.azimuth_placement_angle = 90
-    water.solid = water.rotate_solid(water.solid)
-
-    tungsten.rotation_axis = "X"
-    tungsten.workplane = "ZX"
-    tungsten.azimuth_placement_angle = 90
-    tungsten.solid = tungsten.rotate_solid(tungsten.solid)
-
-    copper.rotation_axis = "X"
-    copper.workplane = "ZX"
-    copper.azimuth_placement_angle = 90
-    copper.solid = copper.rotate_solid(copper.solid)
-
-    cucrzr.rotation_axis = "X"
-    cucrzr.workplane = "ZX"
-    cucrzr.azimuth_placement_angle = 90
-    cucrzr.solid = cucrzr.rotate_solid(cucrzr.solid)
-
-    # translate pfu
-
     y_translation = (my_target.nb_pfus - 1) * (
         my_target.pfu_args["width"] + my_target.toroidal_gap
     )
 
-    water.solid = water.solid.translate(
-        cq.Vector(450, y_translation, -300 - my_target.pfu_args["L"])
-    )
-    tungsten.solid = tungsten.solid.translate(
-        cq.Vector(450, y_translation, -300 - my_target.pfu_args["L"])
-    )
-    copper.solid = copper.solid.translate(
-        cq.Vector(450, y_translation, -300 - my_target.pfu_args["L"])
-    )
-    cucrzr.solid = cucrzr.solid.translate(
-        cq.Vector(450, y_translation, -300 - my_target.pfu_args["L"])
+    # flip pfu, rotate around X axis, translate then rotate around Y axis
+    my_target.place(
+        rotation((450, 1, -300), (450, -1, -300), -27)
+        * translation((450, y_translation, -300 - my_target.pfu_args["L"]))
+        * rotation((-1, 0, 0), (1, 0, 0), 90)
+        * rotation((0, 1, 0), (0, -1, 0), 180)
     )
 
-    # rotate around Y axis
-    tungsten.solid = tungsten.solid.rotate((450, 1, -300), (450, -1, -300), -27)
-    copper.solid = copper.solid.rotate((450, 1, -300), (450, -1, -300), -27)
-    cucrzr.solid = cucrzr.solid.rotate((450, 1, -300), (450, -1, -300), -27)
-    water.solid = water.solid.rotate((450, 1, -300), (450, -1, -300), -27)
+    return my_target.tungsten, my_target.copper, my_target.tube, my_target.water
 
-    return tungsten.solid, copper.solid, cucrzr.solid, water.solid
 
+if __name__ == "__main__":
+    from paramak import Reactor, Shape, Plasma, ITERtypeDivertor
 
-tungsten_inner, copper_inner, cucrzr_inner, water_inner = make_inner_target()
-tungsten_outer, copper_outer, cucrzr_outer, water_outer = make_outer_target()
-tungsten_dome, copper_dome, cucrzr_dome, water_dome = make_dome()
+    add_hook(print_event)
+    recorder = TraceRecorder()
+    add_hook(recorder)
 
-tungsten = Shape(name="tungsten")
-copper = Shape(name="copper")
-cucrzr = Shape(name="cucrzr")
-water = Shape(name="water")
+    divertor = Divertor(
+        {
+            "inner_target": make_inner_target,
+            "outer_target": make_outer_target,
+            "dome": make_dome,
+        },
+        fuse=FUSE,
+        n_jobs=N_JOBS,
+    )
+    divertor.build()
+    print(divertor.timings_summary())
 
-tungsten.solid = tungsten_outer.union(tungsten_inner).union(tungsten_dome)
-copper.solid = copper_outer.union(copper_inner).union(copper_dome)
-cucrzr.solid = cucrzr_outer.union(cucrzr_inner).union(cucrzr_dome)
-water.solid = water_outer.union(water_inner).union(water_dome)
+    tungsten = Shape(name="tungsten")
+    copper = Shape(name="copper")
+    cucrzr = Shape(name="cucrzr")
+    water = Shape(name="water")
 
+    tungsten.solid = divertor.tungsten
+    copper.solid = divertor.copper
+    cucrzr.solid = divertor.tube
+    water.solid = divertor.water
 
-plasma = Plasma(
-    major_radius=6.2e2,
-    minor_radius=2e2,
-    elongation=1.7,
-    triangularity=0.33,
-    vertical_displacement=5.7e1,
-    configuration="single-null",
-    rotation_angle=3,
-)
 
-divertor_model = ITERtypeDivertor(rotation_angle=3)
+    plasma = Plasma(
+        major_radius=6.2e2,
+        minor_radius=2e2,
+        elongation=1.7,
+        triangularity=0.33,
+        vertical_displacement=5.7e1,
+        configuration="single-null",
+        rotation_angle=3,
+    )
+
+    divertor_model = ITERtypeDivertor(rotation_angle=3)
 
-my_reactor = Reactor([tungsten, copper, cucrzr, water])
+    my_reactor = Reactor([tungsten, copper, cucrzr, water])
 
-print('exporting reactor')
-my_reactor.export_stl("reactor.stl")
-# my_reactor.export_dagmc_h5m("dagmc.h5m", exclude=["plasma"])
+    with stage("export", filename="reactor.stl"):
+        my_reactor.export_stl("reactor.stl")
+    recorder.write_chrome_trace("trace.json")
+    # my_reactor.export_dagmc_h5m("dagmc.h5m", exclude=["plasma"])
 
 
-# os.system('mbconvert dagmc.h5m dagmc.vtk')
+    # os.system('mbconvert dagmc.h5m dagmc.vtk')
@@ -0,0 +1,317 @@
+import cadquery as cq
+from OCP.BRep import BRep_Tool
+from OCP.BRepAlgoAPI import BRepAlgoAPI_BuilderAlgo
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.TopAbs import TopAbs_FACE, TopAbs_FORWARD
+from OCP.TopExp import TopExp, TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS
+from OCP.TopTools import TopTools_IndexedMapOfShape, TopTools_ListOfShape
+import numpy as np
+
+from pfu import MATERIALS
+from export import tessellate, solid_instances, pfu_placements
+from mesh import merge_nodes
+from tracing import stage, count
+from parallel import run, to_brep, from_brep
+
+
+def facet_worker(brep, tolerance, angular_tolerance):
+    """Facets a serialized solid, to be run in a worker process
+    Args:
+        brep (bytes): the solid serialized with to_brep
+        tolerance (float): linear tolerance
+        angular_tolerance (float): angular tolerance (rad)
+    Returns:
+        np.ndarray, np.ndarray: the (N, 3) vertices and (M, 3) triangles
+    """
+    return tessellate(from_brep([brep]).val(), tolerance, angular_tolerance)
+
+
+def dagmc_volumes(
+    obj,
+    materials=MATERIALS,
+    tolerance=0.1,
+    angular_tolerance=0.1,
+    per_monoblock=True,
+    n_jobs=1,
+):
+    """Facets the solids of a PFU or a Target, one volume per solid.
+    Each unique solid (of the base PFU of a Target, and optionally of the
+    monoblock prototypes) is faceted once, in parallel worker processes, and
+    its facets are transformed for each of its copies. The volumes are
+    faceted independently: the interfaces between touching volumes are
+    not shared (see dagmc_model for a DAGMC model).
+    Args:
+        obj (PFU or Target): the PFU or Target
+        materials (list, optional): materials to facet.
+            Defaults to ["tungsten", "copper", "tube", "water"].
+        tolerance (float, optional): linear tolerance. Defaults to 0.1.
+        angular_tolerance (float, optional): angular tolerance (rad).
+            Defaults to 0.1.
+        per_monoblock (bool, optional): if True, the tungsten of each
+            monoblock is a volume faceted from its prototype (see
+            export.solid_instances). Defaults to True.
+        n_jobs (int, optional): number of worker processes, -1 meaning all
+            the CPUs. Defaults to 1.
+    Returns:
+        list: (material, (N, 3) vertices, (M, 3) triangles) of each volume
+    """
+    base_pfu, pfu_matrices = pfu_placements(obj)
+    unique_solids = [
+        (material, solid, matrices)
+        for material in materials
+        for solid, matrices in solid_instances(base_pfu, material, per_monoblock)
+    ]
+    with stage("faceting", nb_solids=len(unique_solids)):
+        meshes = run(
+            facet_worker,
+            [
+                (
+                    to_brep(cq.Workplane("XY").add(solid))[0],
+                    tolerance,
+                    angular_tolerance,
+                )
+                for _, solid, _ in unique_solids
+            ],
+            n_jobs=n_jobs,
+        )
+
+    volumes = []
+    for (material, _, matrices), (vertices, triangles) in zip(unique_solids, meshes):
+        all_matrices = np.einsum("pij,mjk->pmik", pfu_matrices, matrices)
+        for matrix in all_matrices.reshape(-1, 4, 4):
+            placed_vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+            volumes.append((material, placed_vertices, triangles))
+    return volumes
+
+
+def imprint(solids):
+    """Imprints solids on each other with a general fuse, so that touching
+    solids share the faces of their interfaces
+    Args:
+        solids (list): the cq.Solid, which must not overlap
+    Raises:
+        RuntimeError: if the general fuse fails
+        ValueError: if solids overlap
+    Returns:
+        list: the imprinted cq.Solid of each solid
+    """
+    arguments = TopTools_ListOfShape()
+    for solid in solids:
+        arguments.Append(solid.wrapped)
+    builder = BRepAlgoAPI_BuilderAlgo()
+    builder.SetArguments(arguments)
+    builder.Build()
+    count("boolean")
+    if not builder.IsDone():
+        raise RuntimeError("imprint operation failed")
+
+    imprinted = []
+    for solid in solids:
+        modified = list(builder.Modified(solid.wrapped))
+        if len(modified) > 1:
+            raise ValueError("solids overlap")
+        imprinted.append(cq.Shape.cast(modified[0]) if modified else solid)
+    return imprinted
+
+
+def dagmc_model(obj, materials=MATERIALS, tolerance=0.1, angular_tolerance=0.1):
+    """Facets the solids of a PFU or a Target in a DAGMC model, one volume
+    per solid, whose touching volumes share the surfaces of their
+    interfaces. The solids of the base PFU are imprinted on each other (see
+    imprint) and meshed at once, each face being a surface faceted once,
+    and the model is replicated for each PFU of a Target (the PFUs don't
+    touch each other).
+    Args:
+        obj (PFU or Target): the PFU or Target
+        materials (list, optional): materials to facet.
+            Defaults to ["tungsten", "copper", "tube", "water"].
+        tolerance (float, optional): linear tolerance. Defaults to 0.1.
+        angular_tolerance (float, optional): angular tolerance (rad).
+            Defaults to 0.1.
+    Returns:
+        dict: "materials" (list) of the volumes, "vertices" (N, 3) and
+            "surfaces", the (M, 3) triangles and the forward and reverse
+            volumes (indices, -1 for the implicit complement) of each
+            surface, the triangles being oriented outwards of the forward
+            volume
+    """
+    base_pfu, pfu_matrices = pfu_placements(obj)
+    volume_materials, solids = [], []
+    for material in materials:
+        for shape in base_pfu.get(material).vals():
+            for solid in shape.Solids():
+                volume_materials.append(material)
+                solids.append(solid)
+    with stage("imprint", nb_solids=len(solids)):
+        solids = imprint(solids)
+
+    compound = cq.Compound.makeCompound(solids)
+    with stage("faceting", nb_solids=len(solids)):
+        BRepMesh_IncrementalMesh(
+            compound.wrapped, tolerance, False, angular_tolerance, True
+        )
+
+    faces = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(compound.wrapped, TopAbs_FACE, faces)
+    senses = np.full((faces.Extent(), 2), -1)
+    for volume, solid in enumerate(solids):
+        explorer = TopExp_Explorer(solid.wrapped, TopAbs_FACE)
+        while explorer.More():
+            face = explorer.Current()
+            # the normal of a forward face points out of the solid
+            side = 0 if face.Orientation() == TopAbs_FORWARD else 1
+            senses[faces.FindIndex(face) - 1, side] = volume
+            explorer.Next()
+
+    all_vertices, all_triangles, surface_senses = [], {}, []
+    nb_vertices = 0
+    for i in range(faces.Extent()):
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation_s(
+            TopoDS.Face_s(faces.FindKey(i + 1)), location
+        )
+        if triangulation is None:
+            continue
+        transformation = location.Transformation()
+        nodes = (
+            triangulation.Node(j).Transformed(transformation)
+            for j in range(1, triangulation.NbNodes() + 1)
+        )
+        all_vertices.append(np.array([(p.X(), p.Y(), p.Z()) for p in nodes]))
+        # in the natural orientation of the face
+        triangles = np.array(
+            [[t.Value(k) for k in (1, 2, 3)] for t in triangulation.Triangles()]
+        )
+        all_triangles[len(surface_senses)] = triangles - 1 + nb_vertices
+        surface_senses.append(senses[i])
+        nb_vertices += triangulation.NbNodes()
+    # the faces sharing an edge have the same nodes on it
+    vertices, all_triangles = merge_nodes(np.concatenate(all_vertices), all_triangles)
+    for i, triangles in all_triangles.items():
+        # the triangles along the seams of some faces have coincident nodes
+        degenerate = (triangles[:, [0, 1, 2]] == triangles[:, [1, 2, 0]]).any(axis=1)
+        all_triangles[i] = triangles[~degenerate]
+
+    surfaces = []
+    for k in range(len(pfu_matrices)):
+        volume_offset = k * len(solids)
+        for i, senses in enumerate(surface_senses):
+            surfaces.append(
+                (
+                    all_triangles[i] + k * len(vertices),
+                    np.where(senses >= 0, senses + volume_offset, -1),
+                )
+            )
+    return dict(
+        materials=volume_materials * len(pfu_matrices),
+        vertices=np.concatenate(
+            [vertices @ matrix[:3, :3].T + matrix[:3, 3] for matrix in pfu_matrices]
+        ),
+        surfaces=surfaces,
+    )
+
+
+def write_h5m(model, filename):
+    """Writes a DAGMC model to a h5m file, each volume belonging to the
+    group mat:<material>. Requires pymoab.
+    Args:
+        model (dict): the DAGMC model (see dagmc_model)
+        filename (str): the h5m file
+    """
+    try:
+        from pymoab import core, types
+    except ImportError as e:
+        raise ImportError("pymoab is required to write h5m files") from e
+
+    moab_core = core.Core()
+    category_tag = moab_core.tag_get_handle(
+        types.CATEGORY_TAG_NAME,
+        types.CATEGORY_TAG_SIZE,
+        types.MB_TYPE_OPAQUE,
+        types.MB_TAG_SPARSE,
+        create_if_missing=True,
+    )
+    name_tag = moab_core.tag_get_handle(
+        types.NAME_TAG_NAME,
+        types.NAME_TAG_SIZE,
+        types.MB_TYPE_OPAQUE,
+        types.MB_TAG_SPARSE,
+        create_if_missing=True,
+    )
+    geom_dimension_tag = moab_core.tag_get_handle(
+        types.GEOM_DIMENSION_TAG_NAME,
+        1,
+        types.MB_TYPE_INTEGER,
+        types.MB_TAG_DENSE,
+        create_if_missing=True,
+    )
+    surf_sense_tag = moab_core.tag_get_handle(
+        "GEOM_SENSE_2",
+        2,
+        types.MB_TYPE_HANDLE,
+        types.MB_TAG_SPARSE,
+        create_if_missing=True,
+    )
+    global_id_tag = moab_core.tag_get_handle(types.GLOBAL_ID_TAG_NAME)
+
+    with stage("export", filename=filename, nb_volumes=len(model["materials"])):
+        vertex_handles = np.array(
+            moab_core.create_vertices(
+                np.ascontiguousarray(model["vertices"], dtype=float).flatten()
+            ),
+            dtype=np.uint64,
+        )
+
+        groups, volume_sets = {}, []
+        for volume_id, material in enumerate(model["materials"], 1):
+            volume_set = moab_core.create_meshset()
+            moab_core.tag_set_data(global_id_tag, volume_set, volume_id)
+            moab_core.tag_set_data(geom_dimension_tag, volume_set, 3)
+            moab_core.tag_set_data(category_tag, volume_set, "Volume")
+            if material not in groups:
+                group_set = moab_core.create_meshset()
+                moab_core.tag_set_data(category_tag, group_set, "Group")
+                moab_core.tag_set_data(name_tag, group_set, "mat:{}".format(material))
+                moab_core.tag_set_data(geom_dimension_tag, group_set, 4)
+                groups[material] = group_set
+            moab_core.add_entity(groups[material], volume_set)
+            volume_sets.append(volume_set)
+
+        for surface_id, (triangles, senses) in enumerate(model["surfaces"], 1):
+            surface_set = moab_core.create_meshset()
+            moab_core.tag_set_data(global_id_tag, surface_set, surface_id)
+            moab_core.tag_set_data(geom_dimension_tag, surface_set, 2)
+            moab_core.tag_set_data(category_tag, surface_set, "Surface")
+            # forward and reverse volumes, 0 being the implicit complement
+            sense_sets = [
+                volume_sets[volume] if volume >= 0 else np.uint64(0)
+                for volume in senses
+            ]
+            for volume_set in sense_sets:
+                if volume_set != 0:
+                    moab_core.add_parent_child(volume_set, surface_set)
+            moab_core.tag_set_data(surf_sense_tag, surface_set, sense_sets)
+
+            triangle_handles = moab_core.create_elements(
+                types.MBTRI, vertex_handles[triangles]
+            )
+            moab_core.add_entities(surface_set, vertex_handles[np.unique(triangles)])
+            moab_core.add_entities(surface_set, triangle_handles)
+
+        file_set = moab_core.create_meshset()
+        moab_core.add_entities(file_set, moab_core.get_entities_by_handle(0))
+        moab_core.write_file(filename)
+
+
+def export_h5m(obj, filename, materials=MATERIALS, **kwargs):
+    """Exports a PFU or a Target to a DAGMC h5m file. Requires pymoab.
+    Args:
+        obj (PFU or Target): the PFU or Target
+        filename (str): the h5m file
+        materials (list, optional): materials to export.
+            Defaults to ["tungsten", "copper", "tube", "water"].
+        kwargs: other arguments passed to dagmc_model
+    """
+    write_h5m(dagmc_model(obj, materials=materials, **kwargs), filename)
@@ -0,0 +1,150 @@
+from pfu import MATERIALS, material_property
+from fuse import fuse, compound
+from tracing import stage, record, replay
+from parallel import schedule, nb_workers, to_brep, from_brep
+
+
+def build_component(builder, serialized):
+    """Builds the materials of a component, to be run in a worker process
+    Args:
+        builder (callable): picklable function returning the tungsten,
+            copper, tube and water workplanes of the component
+        serialized (bool): if True, the workplanes are serialized with
+            to_brep and the events of the build are recorded to be replayed
+            in the main process (see tracing.record)
+    Returns:
+        dict: the workplane of each material and the recorded events
+            ("trace") if serialized
+    """
+    if not serialized:
+        return dict(zip(MATERIALS, builder()))
+    with record() as trace:
+        solids = dict(zip(MATERIALS, builder()))
+        result = {material: to_brep(solid) for material, solid in solids.items()}
+    return dict(result, trace=trace)
+
+
+def merge_material(material, fused, parallel_fuse, serialized, *solids):
+    """Merges a material of several components, to be run in a worker
+    process
+    Args:
+        material (str): "tungsten", "copper", "tube" or "water"
+        fused (bool): if True, the components are fused, otherwise they are
+            grouped in a compound
+        parallel_fuse (bool): OCC parallel mode of the fuse operation
+        serialized (bool): if True, the workplanes are serialized with
+            to_brep and the events of the merge are recorded (see
+            build_component)
+        solids: the material of each component (see build_component)
+    Returns:
+        dict: the merged workplane of the material and the recorded events
+            ("trace") if serialized
+    """
+    if not serialized:
+        merged = fuse(solids, parallel=parallel_fuse) if fused else compound(solids)
+        return {material: merged}
+    with record() as trace:
+        solids = [from_brep(solid) for solid in solids]
+        merged = fuse(solids, parallel=parallel_fuse) if fused else compound(solids)
+        result = {material: to_brep(merged)}
+    return dict(result, trace=trace)
+
+
+class Divertor:
+    def __init__(self, components, fuse=True, parallel_fuse=False, n_jobs=1) -> None:
+        """Divertor made of several components (eg. targets and dome) whose
+        materials are merged. The build is a graph of tasks: one node per
+        component and one merge node per material depending on all the
+        components, run concurrently in worker processes if n_jobs is
+        greater than 1.
+        Args:
+            components (dict): builder of each component name, a picklable
+                (module level) function returning the tungsten, copper, tube
+                and water workplanes of the component
+            fuse (bool, optional): if False, the materials of the components
+                are grouped in compounds instead of being fused.
+                Defaults to True.
+            parallel_fuse (bool, optional): if True, the OCC fuse operations
+                run in parallel mode. Defaults to False.
+            n_jobs (int, optional): number of worker processes, -1 meaning all
+                the CPUs. Defaults to 1.
+        """
+        self.components = components
+        self.fuse = fuse
+        self.parallel_fuse = parallel_fuse
+        self.n_jobs = n_jobs
+
+        self.solids = {}
+        self.timings = {}
+
+    tungsten = material_property("tungsten")
+    copper = material_property("copper")
+    tube = material_property("tube")
+    water = material_property("water")
+
+    def get(self, material):
+        """Returns a material of the divertor, building the divertor if
+        needed
+        Args:
+            material (str): "tungsten", "copper", "tube" or "water"
+        Returns:
+            cq.Workplane: the material
+        """
+        if material not in self.solids:
+            self.build()
+        return self.solids[material]
+
+    def graph(self, serialized=False):
+        """Creates the graph of tasks building the divertor
+        Args:
+            serialized (bool, optional): if True, the tasks exchange
+                serialized workplanes. Defaults to False.
+        Returns:
+            dict: (function, args, dependencies) of each node (see
+                parallel.schedule)
+        """
+        nodes = {
+            name: (build_component, (builder, serialized), [])
+            for name, builder in self.components.items()
+        }
+        # each merge only receives its material of the components
+        for material in MATERIALS:
+            nodes["merge {}".format(material)] = (
+                merge_material,
+                (material, self.fuse, self.parallel_fuse, serialized),
+                [(name, material) for name in self.components],
+            )
+        return nodes
+
+    def build(self):
+        """Builds the components and merges their materials. The timing of
+        each node is stored in the timings attribute. The events of the
+        nodes run in worker processes are sent to the hooks of this
+        process."""
+        serialized = nb_workers(self.n_jobs) > 1
+        with stage("divertor build", nb_components=len(self.components)):
+            results, self.timings = schedule(self.graph(serialized), n_jobs=self.n_jobs)
+            for result in results.values():
+                if "trace" in result:
+                    replay(result["trace"])
+        for material in MATERIALS:
+            solid = results["merge {}".format(material)][material]
+            self.solids[material] = from_brep(solid) if serialized else solid
+
+    def timings_summary(self):
+        """Formats the timings of the last build
+        Returns:
+            str: one line per node with its start (relative to the first
+                node), duration and worker pid
+        """
+        if not self.timings:
+            return ""
+        origin = min(timing["start"] for timing in self.timings.values())
+        return "\n".join(
+            "{}: start {:.2f} s, duration {:.2f} s (pid {})".format(
+                name, timing["start"] - origin, timing["duration"], timing["pid"]
+            )
+            for name, timing in sorted(
+                self.timings.items(), key=lambda item: item[1]["start"]
+            )
+        )
@@ -1,5 +1,6 @@
 from pfu import PFU
 from target import Target
+from cache import GeometryCache
 import cadquery as cq
 
 import numpy as np
@@ -35,6 +36,7 @@ dome = Target(
     gap=0.1,
     thickness_mb=1.2,
     nb_mbs_on_curve=54,
+    cache=GeometryCache(),
 )
 
 
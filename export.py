@@ -0,0 +1,323 @@
+import cadquery as cq
+from OCP.IFSelect import IFSelect_RetDone
+from OCP.STEPCAFControl import STEPCAFControl_Writer
+from OCP.STEPControl import STEPControl_AsIs
+from OCP.TCollection import TCollection_ExtendedString
+from OCP.TDataStd import TDataStd_Name
+from OCP.TDocStd import TDocStd_Document
+from OCP.TopLoc import TopLoc_Location
+from OCP.XCAFApp import XCAFApp_Application
+from OCP.XCAFDoc import XCAFDoc_DocumentTool
+import numpy as np
+
+from tracing import stage
+from transforms import location_to_matrix
+from pfu import MATERIALS
+
+STL_DTYPE = np.dtype(
+    [
+        ("normal", "<f4", (3,)),
+        ("vertices", "<f4", (3, 3)),
+        ("attribute", "<u2"),
+    ]
+)
+
+
+def tessellate(workplane, tolerance=0.1, angular_tolerance=0.1):
+    """Tessellates the shapes of a workplane
+    Args:
+        workplane (cq.Workplane or cq.Shape): the shapes
+        tolerance (float, optional): linear tolerance. Defaults to 0.1.
+        angular_tolerance (float, optional): angular tolerance (rad).
+            Defaults to 0.1.
+    Returns:
+        np.ndarray, np.ndarray: the (N, 3) vertices and (M, 3) triangles
+    """
+    shapes = workplane.vals() if isinstance(workplane, cq.Workplane) else [workplane]
+    all_vertices, all_triangles = [], []
+    offset = 0
+    with stage("tessellation"):
+        for shape in shapes:
+            vertices, triangles = shape.tessellate(tolerance, angular_tolerance)
+            all_vertices.append(
+                np.array([v.toTuple() for v in vertices]).reshape(-1, 3)
+            )
+            all_triangles.append(np.array(triangles, dtype=int).reshape(-1, 3) + offset)
+            offset += len(vertices)
+    return np.concatenate(all_vertices), np.concatenate(all_triangles)
+
+
+def translation_matrix(vector):
+    """Creates the 4x4 matrix of a translation
+    Args:
+        vector (cq.Vector or tuple): the translation vector
+    Returns:
+        np.ndarray: the (4, 4) matrix
+    """
+    matrix = np.eye(4)
+    matrix[:3, 3] = tuple(vector.toTuple() if isinstance(vector, cq.Vector) else vector)
+    return matrix
+
+
+def replicate(vertices, triangles, matrices):
+    """Computes the coordinates of the triangles of a mesh for each of its
+    placements
+    Args:
+        vertices (np.ndarray): (N, 3) vertices of the mesh
+        triangles (np.ndarray): (M, 3) triangles of the mesh
+        matrices (np.ndarray): (K, 4, 4) transformation matrices
+    Returns:
+        np.ndarray: (K * M, 3, 3) coordinates of the triangles
+    """
+    matrices = np.asarray(matrices).reshape(-1, 4, 4)
+    placed_vertices = (
+        np.einsum("kij,nj->kni", matrices[:, :3, :3], vertices)
+        + matrices[:, None, :3, 3]
+    )
+    return placed_vertices[:, triangles].reshape(-1, 3, 3)
+
+
+def write_stl(filename, triangles):
+    """Writes triangles in a binary STL file
+    Args:
+        filename (str): the STL file
+        triangles (np.ndarray): (M, 3, 3) coordinates of the triangles
+    """
+    normals = np.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    norms = np.linalg.norm(normals, axis=1)
+    normals[norms > 0] /= norms[norms > 0, None]
+
+    data = np.zeros(len(triangles), dtype=STL_DTYPE)
+    data["normal"] = normals
+    data["vertices"] = triangles
+    with open(filename, "wb") as f:
+        f.write(b"pfu_geometry binary STL".ljust(80, b" "))
+        f.write(np.uint32(len(triangles)).tobytes())
+        f.write(data.tobytes())
+
+
+def solid_instances(pfu, material, per_monoblock=False):
+    """Lists the unique solids of a material of a PFU and their placements
+    Args:
+        pfu (PFU): the PFU (not a translated copy)
+        material (str): "tungsten", "copper", "tube" or "water"
+        per_monoblock (bool, optional): if True, the tungsten of each
+            monoblock prototype is listed once with the placements of the
+            monoblocks (the monoblocks are then separate bodies instead of
+            the fused solid). Ignored for the other materials.
+            Defaults to False.
+    Returns:
+        list: (cq.Shape, (K, 4, 4) matrices) of each unique solid
+    """
+    # the copper of each monoblock is cut from the tube individually so
+    # only the tungsten can be replicated from the monoblock prototypes
+    if not per_monoblock or material != "tungsten":
+        return [
+            (solid, np.eye(4)[None])
+            for shape in pfu.get(material).vals()
+            for solid in shape.Solids()
+        ]
+
+    placements = {}
+    for mb in pfu.monoblocks:
+        prototype = mb if mb.prototype is None else mb.prototype
+        location = cq.Location(mb.plane) * cq.Location(prototype.plane).inverse
+        placements.setdefault(id(prototype), (prototype, []))[1].append(
+            location_to_matrix(location)
+        )
+    return [
+        (solid, np.array(matrices))
+        for prototype, matrices in placements.values()
+        for shape in prototype.tungsten.vals()
+        for solid in shape.Solids()
+    ]
+
+
+def pfu_instances(pfu, material, per_monoblock=False, **kwargs):
+    """Lists the unique meshes of a material of a PFU and their placements
+    Args:
+        pfu (PFU): the PFU (not a translated copy)
+        material (str): "tungsten", "copper", "tube" or "water"
+        per_monoblock (bool, optional): see solid_instances.
+            Defaults to False.
+        kwargs: arguments passed to tessellate
+    Returns:
+        list: (vertices, triangles, matrices) of each unique mesh
+    """
+    return [
+        (*tessellate(solid, **kwargs), matrices)
+        for solid, matrices in solid_instances(pfu, material, per_monoblock)
+    ]
+
+
+def pfu_placements(obj):
+    """Finds the base PFU of a PFU or a Target and the placements of its
+    copies
+    Args:
+        obj (PFU or Target): the PFU or Target
+    Returns:
+        PFU, np.ndarray: the base PFU and the (P, 4, 4) matrices of the PFUs
+    """
+    pfus = obj.pfus if hasattr(obj, "pfus") else [obj]
+    # the PFUs of a Target are translated copies of a base PFU
+    base_pfu = pfus[0] if pfus[0].source is None else pfus[0].source[0]
+    matrices = np.array(
+        [
+            np.eye(4) if pfu.source is None else translation_matrix(pfu.source[1])
+            for pfu in pfus
+        ]
+    )
+    if getattr(obj, "location", None) is not None:
+        matrices = location_to_matrix(obj.location) @ matrices
+    return base_pfu, matrices
+
+
+def export_stl(obj, material, filename, per_monoblock=False, **kwargs):
+    """Exports a material of a PFU or a Target to a binary STL file. Each
+    unique geometry (the base PFU of a Target, and optionally the monoblock
+    prototypes) is tessellated once and its mesh is replicated with the
+    transformations of its copies.
+    Args:
+        obj (PFU or Target): the PFU or Target
+        material (str): "tungsten", "copper", "tube" or "water"
+        filename (str): the STL file
+        per_monoblock (bool, optional): see solid_instances.
+            Defaults to False.
+        kwargs: arguments passed to tessellate
+    """
+    base_pfu, pfu_matrices = pfu_placements(obj)
+    instances = pfu_instances(base_pfu, material, per_monoblock, **kwargs)
+    with stage("export", material=material, filename=filename):
+        triangles = np.concatenate(
+            [
+                replicate(
+                    vertices,
+                    mesh_triangles,
+                    np.einsum("pij,mjk->pmik", pfu_matrices, matrices),
+                )
+                for vertices, mesh_triangles, matrices in instances
+            ]
+        )
+        write_stl(filename, triangles)
+
+
+class InstancedDocument:
+    def __init__(self) -> None:
+        """XCAF document in which each unique shape is stored once, its
+        copies being instances of it"""
+        app = XCAFApp_Application.GetApplication_s()
+        self.doc = TDocStd_Document(TCollection_ExtendedString("XmlXCAF"))
+        app.InitDocument(self.doc)
+        self.tool = XCAFDoc_DocumentTool.ShapeTool_s(self.doc.Main())
+        self.tool.SetAutoNaming_s(False)
+        self.parts = {}
+
+    def set_name(self, label, name):
+        TDataStd_Name.Set_s(label, TCollection_ExtendedString(name))
+
+    def assembly(self, name):
+        """Creates an empty assembly
+        Args:
+            name (str): name of the assembly
+        Returns:
+            TDF_Label: the label of the assembly
+        """
+        label = self.tool.NewShape()
+        self.set_name(label, name)
+        return label
+
+    def add(self, assembly, label, name, location=None):
+        """Adds an instance of a part or an assembly to an assembly
+        Args:
+            assembly (TDF_Label): the assembly
+            label (TDF_Label): the part or assembly to instantiate
+            name (str): name of the instance
+            location (cq.Location, optional): location of the instance.
+                Defaults to None.
+        """
+        location = TopLoc_Location() if location is None else location.wrapped
+        component = self.tool.AddComponent(assembly, label, location)
+        self.set_name(component, name)
+
+    def add_shape(self, assembly, shape, name):
+        """Adds a shape to an assembly. Shapes sharing their geometry with a
+        shape already added (eg. moved copies) are instances of the same part.
+        Args:
+            assembly (TDF_Label): the assembly
+            shape (cq.Shape): the shape
+            name (str): name of the instance (and of the part if new)
+        """
+        location = shape.location()
+        part_shape = cq.Shape.cast(shape.wrapped.Located(TopLoc_Location()))
+        if part_shape not in self.parts:
+            label = self.tool.AddShape(part_shape.wrapped, False)
+            self.set_name(label, name)
+            self.parts[part_shape] = label
+        self.add(assembly, self.parts[part_shape], name, location)
+
+    def write(self, filename):
+        """Writes the document to a STEP file
+        Args:
+            filename (str): the STEP file
+        """
+        self.tool.UpdateAssemblies()
+        writer = STEPCAFControl_Writer()
+        writer.SetNameMode(True)
+        writer.Transfer(self.doc, STEPControl_AsIs)
+        if writer.Write(filename) != IFSelect_RetDone:
+            raise RuntimeError("failed to write {}".format(filename))
+
+
+def pfu_document_assembly(document, pfu, name="pfu"):
+    """Adds a PFU to an instanced document as an assembly with one child
+    per material. If the monoblocks are not fused, each monoblock solid is a
+    child of its material, the tungsten of the monoblocks being instances of
+    the monoblock prototypes.
+    Args:
+        document (InstancedDocument): the document
+        pfu (PFU): the PFU
+        name (str, optional): name of the assembly. Defaults to "pfu".
+    Returns:
+        TDF_Label: the label of the assembly
+    """
+    assembly = document.assembly(name)
+    for material in MATERIALS:
+        shape = pfu.get(material).val()
+        if pfu.fuse or material not in ["tungsten", "copper"]:
+            document.add_shape(assembly, shape, material)
+            continue
+        material_assembly = document.assembly(material)
+        for i, monoblock_shape in enumerate(shape):
+            name = "{}_{}".format(material, i)
+            document.add_shape(material_assembly, monoblock_shape, name)
+        document.add(assembly, material_assembly, material)
+    return assembly
+
+
+def export_step(obj, filename):
+    """Exports a PFU or a Target to an instanced STEP assembly. The geometry
+    of the base PFU of a Target is written once, the PFUs being placed
+    instances of it (as well as the monoblocks of the PFUs if they are not
+    fused).
+    Args:
+        obj (PFU or Target): the PFU or Target
+        filename (str): the STEP file
+    """
+    document = InstancedDocument()
+    with stage("export", filename=filename):
+        if not hasattr(obj, "pfus"):
+            root = pfu_document_assembly(document, obj)
+        else:
+            root = document.assembly("target")
+            pfus = obj.pfus
+            base_pfu = pfus[0] if pfus[0].source is None else pfus[0].source[0]
+            pfu_assembly = pfu_document_assembly(document, base_pfu)
+            for i, pfu in enumerate(pfus):
+                location = None if pfu.source is None else cq.Location(pfu.source[1])
+                document.add(root, pfu_assembly, "pfu_{}".format(i), location)
+            if obj.location is not None:
+                placed_root = document.assembly("placed target")
+                document.add(placed_root, root, "target", obj.location)
+        document.write(filename)
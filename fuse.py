@@ -0,0 +1,83 @@
+import cadquery as cq
+from OCP.BRepAlgoAPI import BRepAlgoAPI_Fuse
+from OCP.TopTools import TopTools_ListOfShape
+from tracing import count
+
+
+def fuse(workplanes, parallel=False, method="batch", clean=True):
+    """Fuses several workplanes together.
+    Args:
+        workplanes (list): list of cq.Workplane to fuse
+        parallel (bool, optional): if True, sets the SetRunParallel flag of
+            the OCC boolean operation. Defaults to False.
+        method (str, optional): "batch" fuses all the shapes in a single
+            boolean operation, "tree" fuses them pairwise in a balanced tree.
+            Defaults to "batch".
+        clean (bool, optional): if True, the fused shape is cleaned.
+            Defaults to True.
+    Returns:
+        cq.Workplane: the fused workplane
+    """
+    if len(workplanes) == 0:
+        raise ValueError("at least one workplane is needed")
+    if method == "batch":
+        shapes = [obj for wp in workplanes for obj in wp.vals()]
+        fused = fuse_shapes(shapes, parallel=parallel)
+    elif method == "tree":
+        shapes = [fuse_shapes(wp.vals(), parallel=parallel) for wp in workplanes]
+        while len(shapes) > 1:
+            shapes = [
+                fuse_shapes(shapes[i : i + 2], parallel=parallel)
+                for i in range(0, len(shapes), 2)
+            ]
+        fused = shapes[0]
+    else:
+        raise ValueError("unknown fuse method {}".format(method))
+
+    if clean:
+        fused = fused.clean()
+    return workplanes[0].newObject([fused])
+
+
+def fuse_shapes(shapes, parallel=False):
+    """Fuses a list of cq.Shape with a single BRepAlgoAPI_Fuse operation.
+    Args:
+        shapes (list): list of cq.Shape
+        parallel (bool, optional): if True, sets the SetRunParallel flag of
+            the OCC boolean operation. Defaults to False.
+    Returns:
+        cq.Shape: the fused shape
+    """
+    if len(shapes) == 1:
+        return shapes[0]
+
+    arguments = TopTools_ListOfShape()
+    arguments.Append(shapes[0].wrapped)
+    tools = TopTools_ListOfShape()
+    for shape in shapes[1:]:
+        tools.Append(shape.wrapped)
+
+    fuse_op = BRepAlgoAPI_Fuse()
+    fuse_op.SetArguments(arguments)
+    fuse_op.SetTools(tools)
+    fuse_op.SetRunParallel(parallel)
+    fuse_op.Build()
+    count("boolean")
+    if not fuse_op.IsDone():
+        raise RuntimeError("fuse operation failed")
+
+    return cq.Shape.cast(fuse_op.Shape())
+
+
+def compound(workplanes):
+    """Groups several workplanes in a single compound, without any boolean
+    operation. The shapes keep their identity in the compound.
+    Args:
+        workplanes (list): list of cq.Workplane
+    Returns:
+        cq.Workplane: a workplane holding the compound
+    """
+    if len(workplanes) == 0:
+        raise ValueError("at least one workplane is needed")
+    shapes = [obj for wp in workplanes for obj in wp.vals()]
+    return workplanes[0].newObject([cq.Compound.makeCompound(shapes)])
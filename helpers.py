@@ -47,10 +47,7 @@ def distance_between_two_points(
         float: distance between A and B
     """
 
-    xa, ya = point_a[0], point_a[1]
-    xb, yb = point_b[0], point_b[1]
-    u_vec = [xb - xa, yb - ya]
-    return np.linalg.norm(u_vec)
+    return math.hypot(point_b[0] - point_a[0], point_b[1] - point_a[1])
 
 
 def angle_between_two_points_on_circle(
@@ -85,3 +82,95 @@ def find_radius_of_circle(
     )
 
     return radius
+
+
+# batched versions, taking arrays of points (..., 2) and returning masked
+# arrays in which the degenerate inputs are masked
+
+
+def find_center_points_of_circles(
+    points_a: np.ndarray, points_b: np.ndarray, points_3: np.ndarray
+) -> np.ma.MaskedArray:
+    """Calculates the centers of circles passing through 3 points, for many
+    triplets of points at once (see find_center_point_of_circle).
+    Args:
+        points_a: (..., 2) coordinates of the first points
+        points_b: (..., 2) coordinates of the second points
+        points_3: (..., 2) coordinates of the third points
+    Returns:
+        (..., 2) coordinates of the centers, masked where the 3 points are
+        on a line
+    """
+    points_a, points_b, points_3 = np.broadcast_arrays(
+        np.asarray(points_a, dtype=float),
+        np.asarray(points_b, dtype=float),
+        np.asarray(points_3, dtype=float),
+    )
+    xa, ya = points_a[..., 0], points_a[..., 1]
+    xb, yb = points_b[..., 0], points_b[..., 1]
+    x3, y3 = points_3[..., 0], points_3[..., 1]
+
+    temp = xb * xb + yb * yb
+    bc = (xa * xa + ya * ya - temp) / 2
+    cd = (temp - x3 * x3 - y3 * y3) / 2
+    det = (xa - xb) * (yb - y3) - (xb - x3) * (ya - yb)
+
+    degenerate = np.abs(det) < 1.0e-6
+    det = np.where(degenerate, 1, det)
+    cx = (bc * (yb - y3) - cd * (ya - yb)) / det
+    cy = ((xa - xb) * cd - (xb - x3) * bc) / det
+
+    centers = np.stack([cx, cy], axis=-1)
+    mask = np.repeat(degenerate[..., None], 2, axis=-1)
+    return np.ma.masked_array(centers, mask=mask)
+
+
+def distances_between_points(points_a: np.ndarray, points_b: np.ndarray) -> np.ndarray:
+    """Computes the distances between many pairs of points.
+    Args:
+        points_a: (..., 2) X, Y coordinates of the first points
+        points_b: (..., 2) X, Y coordinates of the second points
+    Returns:
+        (...) distances between A and B
+    """
+    delta = np.asarray(points_b) - np.asarray(points_a)
+    return np.hypot(delta[..., 0], delta[..., 1])
+
+
+def find_radii_of_circles(
+    center_points: np.ndarray, edge_points: np.ndarray
+) -> np.ma.MaskedArray:
+    """Calculates the radii of many circles (see find_radius_of_circle).
+    Args:
+        center_points: (..., 2) x, y coordinates of the centers, possibly
+            masked (see find_center_points_of_circles)
+        edge_points: (..., 2) x, y coordinates of points on the edges of the
+            circles
+    Returns:
+        (...) radii of the circles, inf where the center and the edge point
+        coincide and masked where the center is masked
+    """
+    center_points = np.ma.asarray(center_points)
+    delta = np.asarray(edge_points) - center_points
+    radii = np.ma.sqrt(delta[..., 0] ** 2 + delta[..., 1] ** 2)
+    return np.ma.where(radii == 0, np.inf, radii)
+
+
+def angles_between_points_on_circles(
+    points_1: np.ndarray, points_2: np.ndarray, radii_of_circles: np.ndarray
+) -> np.ma.MaskedArray:
+    """Calculates the angles subtended by many pairs of points on circles
+    (see angle_between_two_points_on_circle).
+    Args:
+        points_1: (..., 2) coordinates of the first points
+        points_2: (..., 2) coordinates of the second points
+        radii_of_circles: (...) radii of the circles, possibly masked
+    Returns:
+        (...) angles (rad), masked where the radius is masked or where the
+        points are further apart than the diameter of the circle
+    """
+    separations = distances_between_points(points_1, points_2)
+    squared_radii = np.ma.asarray(radii_of_circles) ** 2
+    isos_tri_terms = (2 * squared_radii - separations**2) / (2 * squared_radii)
+    # np.ma.arccos masks the values outside [-1, 1]
+    return np.ma.arccos(isos_tri_terms)
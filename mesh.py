@@ -0,0 +1,271 @@
+import cadquery as cq
+import numpy as np
+
+import os
+import tempfile
+import warnings
+
+from monoblock import Monoblock
+from transforms import location_to_matrix
+from tracing import stage
+
+MONOBLOCK_MATERIALS = ["tungsten", "copper", "cucrzr"]
+MATERIAL_TAGS = {"tungsten": 1, "copper": 2, "cucrzr": 3}
+
+
+def mesh_monoblock(monoblock, size=0.2):
+    """Meshes a monoblock with gmsh in tetrahedra, with conforming tungsten,
+    copper and CuCrZr subdomains. The mesh of the two end annuli of the
+    CuCrZr is periodic (translation by thickness + gap along the normal),
+    so that the meshes of consecutive monoblocks on a straight part match
+    on their interface. Requires gmsh.
+    Args:
+        monoblock (Monoblock): the monoblock (built with hollow=True so that
+            the materials don't overlap)
+        size (float, optional): maximum size of the elements (mm).
+            Defaults to 0.2.
+    Returns:
+        np.ndarray, dict: the (N, 3) nodes and the (M, 4) tetrahedra of each
+            material
+    """
+    try:
+        import gmsh
+    except ImportError as e:
+        raise ImportError("gmsh is required to mesh the monoblocks") from e
+
+    gmsh.initialize()
+    try:
+        gmsh.option.setNumber("General.Terminal", 0)
+        gmsh.model.add("monoblock")
+        volumes = []
+        with tempfile.TemporaryDirectory() as directory:
+            for material in MONOBLOCK_MATERIALS:
+                filename = os.path.join(directory, material + ".brep")
+                cq.Compound.makeCompound(
+                    getattr(monoblock, material).vals()
+                ).exportBrep(filename)
+                volumes.append(
+                    [tag for dim, tag in gmsh.model.occ.importShapes(filename)]
+                )
+        input_dim_tags = [(3, tag) for tags in volumes for tag in tags]
+        _, children = gmsh.model.occ.fragment(input_dim_tags[:1], input_dim_tags[1:])
+        gmsh.model.occ.synchronize()
+
+        # each input volume is split in the fragments it is made of
+        material_volumes = {material: set() for material in MONOBLOCK_MATERIALS}
+        i = 0
+        for material, tags in zip(MONOBLOCK_MATERIALS, volumes):
+            for _ in tags:
+                material_volumes[material].update(tag for _, tag in children[i])
+                i += 1
+        for material, tags in material_volumes.items():
+            gmsh.model.addPhysicalGroup(
+                3, sorted(tags), MATERIAL_TAGS[material], name=material
+            )
+        set_periodic_ends(gmsh, monoblock, material_volumes["cucrzr"])
+
+        gmsh.option.setNumber("Mesh.MeshSizeMax", size)
+        with stage("meshing", size=size):
+            gmsh.model.mesh.generate(3)
+
+        node_tags, coordinates, _ = gmsh.model.mesh.getNodes()
+        index = np.zeros(int(node_tags.max()) + 1, dtype=int)
+        index[node_tags.astype(int)] = np.arange(len(node_tags))
+        nodes = coordinates.reshape(-1, 3)
+
+        cells = {}
+        for material, tags in material_volumes.items():
+            tetrahedra = []
+            for tag in sorted(tags):
+                # element type 4 is the 4-node tetrahedron
+                element_nodes = gmsh.model.mesh.getElementsByType(4, tag)[1]
+                tetrahedra.append(index[element_nodes.astype(int)].reshape(-1, 4))
+            cells[material] = np.concatenate(tetrahedra)
+    finally:
+        gmsh.finalize()
+    return nodes, cells
+
+
+def set_periodic_ends(gmsh, monoblock, cucrzr_volumes):
+    """Makes the mesh of the end annulus of the CuCrZr of a monoblock the
+    translation of the mesh of its start annulus
+    Args:
+        gmsh (module): the gmsh module, with the monoblock model synchronized
+        monoblock (Monoblock): the monoblock
+        cucrzr_volumes (set): tags of the CuCrZr volumes
+    Raises:
+        RuntimeError: if the end annuli are not found
+    """
+    origin = np.array(monoblock.plane.origin.toTuple())
+    normal = np.array(monoblock.plane.zDir.toTuple())
+    half_length = (monoblock.thickness + monoblock.gap) / 2
+    boundary = gmsh.model.getBoundary(
+        [(3, tag) for tag in cucrzr_volumes], combined=False, oriented=False
+    )
+    ends = {-1: set(), 1: set()}
+    for _, tag in boundary:
+        centre = np.array(gmsh.model.occ.getCenterOfMass(2, abs(tag)))
+        position = np.dot(centre - origin, normal)
+        for side in ends:
+            if abs(position - side * half_length) < 1e-6 * half_length:
+                ends[side].add(abs(tag))
+    if len(ends[-1]) != 1 or len(ends[1]) != 1:
+        raise RuntimeError("the end annuli of the CuCrZr were not found")
+
+    translation = np.eye(4)
+    translation[:3, 3] = 2 * half_length * normal
+    gmsh.model.mesh.setPeriodic(
+        2, list(ends[1]), list(ends[-1]), translation.flatten().tolist()
+    )
+
+
+def replicate_mesh(nodes, cells, matrices):
+    """Replicates a mesh with transformation matrices, without merging the
+    nodes
+    Args:
+        nodes (np.ndarray): (N, 3) nodes
+        cells (dict): (M, 4) elements of each material
+        matrices (np.ndarray): (K, 4, 4) transformation matrices
+    Returns:
+        np.ndarray, dict: the (K * N, 3) nodes and (K * M, 4) elements of
+            each material
+    """
+    matrices = np.asarray(matrices).reshape(-1, 4, 4)
+    placed_nodes = (
+        np.einsum("kij,nj->kni", matrices[:, :3, :3], nodes) + matrices[:, None, :3, 3]
+    )
+    offsets = np.arange(len(matrices))[:, None, None] * len(nodes)
+    placed_cells = {
+        material: (elements[None] + offsets).reshape(-1, elements.shape[1])
+        for material, elements in cells.items()
+    }
+    return placed_nodes.reshape(-1, 3), placed_cells
+
+
+def merge_nodes(nodes, cells, tolerance=1e-6):
+    """Merges the coincident nodes of a mesh (eg. on the interfaces between
+    replicated monoblocks): the nodes closer than tolerance are found with a
+    KD-tree and merged (transitively). Without scipy, the nodes are hashed
+    on a grid of spacing tolerance instead, which can miss close nodes on
+    either side of a cell boundary.
+    Args:
+        nodes (np.ndarray): (N, 3) nodes
+        cells (dict): elements of each material
+        tolerance (float, optional): distance under which two nodes are
+            merged (mm). Defaults to 1e-6.
+    Returns:
+        np.ndarray, dict: the merged nodes and the renumbered elements
+    """
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        from scipy.spatial import cKDTree
+    except ImportError:
+        keys = np.round(nodes / tolerance).astype(np.int64)
+        _, labels = np.unique(keys, axis=0, return_inverse=True)
+    else:
+        pairs = cKDTree(nodes).query_pairs(tolerance, output_type="ndarray")
+        graph = coo_matrix(
+            (np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+            shape=(len(nodes), len(nodes)),
+        )
+        _, labels = connected_components(graph, directed=False)
+    _, first, inverse = np.unique(
+        labels.reshape(-1), return_index=True, return_inverse=True
+    )
+    inverse = inverse.reshape(-1)
+    merged_cells = {material: inverse[elements] for material, elements in cells.items()}
+    return nodes[first], merged_cells
+
+
+def monoblock_placement_matrices(pfu):
+    """Groups the monoblocks of a PFU by prototype, without building them
+    Args:
+        pfu (PFU): the PFU
+    Returns:
+        list: (monoblock arguments, (K, 4, 4) matrices) of each prototype,
+            the prototype being at the origin
+    """
+    groups = {}
+    for placement in pfu.monoblock_placements():
+        kwargs = dict(placement)
+        plane = cq.Plane(
+            kwargs.pop("location"),
+            normal=kwargs.pop("normal"),
+            xDir=kwargs.pop("xDir", None),
+        )
+        matrix = location_to_matrix(cq.Location(plane))
+        key = tuple(sorted(kwargs.items()))
+        groups.setdefault(key, (kwargs, []))[1].append(matrix)
+    return [(kwargs, np.array(matrices)) for kwargs, matrices in groups.values()]
+
+
+def mesh_pfu(pfu, size=0.2, tolerance=1e-6):
+    """Meshes the monoblocks of a PFU. Each monoblock prototype is meshed
+    once (hollow, the copper of the PFU being cut by the tube) and its mesh
+    is replicated at the monoblock locations, the coincident nodes being
+    merged. The CuCrZr of the monoblocks is longer than the monoblocks by
+    the gap so that it covers the tube between the monoblocks on the
+    straight part, where the mesh is conforming between monoblocks (see
+    mesh_monoblock). On the curved part, the CuCrZr of consecutive
+    monoblocks are not coincident and their meshes are not connected (a
+    warning is issued).
+    Args:
+        pfu (PFU): the PFU
+        size (float, optional): maximum size of the elements (mm).
+            Defaults to 0.2.
+        tolerance (float, optional): distance under which two nodes are
+            merged (mm). Defaults to 1e-6.
+    Returns:
+        np.ndarray, dict: the nodes and the tetrahedra of each material
+    """
+    if pfu.nb_mbs_on_curve > 0:
+        warnings.warn(
+            "the meshes of the {} monoblocks on the curved part are not "
+            "connected to each other".format(pfu.nb_mbs_on_curve)
+        )
+    all_nodes, all_cells = [], {material: [] for material in MONOBLOCK_MATERIALS}
+    nb_nodes = 0
+    for kwargs, matrices in monoblock_placement_matrices(pfu):
+        prototype = Monoblock(**dict(kwargs, hollow=True))
+        nodes, cells = mesh_monoblock(prototype, size=size)
+        nodes, cells = replicate_mesh(nodes, cells, matrices)
+        all_nodes.append(nodes)
+        for material, elements in cells.items():
+            all_cells[material].append(elements + nb_nodes)
+        nb_nodes += len(nodes)
+
+    with stage("merge nodes", nb_nodes=nb_nodes):
+        return merge_nodes(
+            np.concatenate(all_nodes),
+            {material: np.concatenate(c) for material, c in all_cells.items()},
+            tolerance=tolerance,
+        )
+
+
+def write_mesh(nodes, cells, filename):
+    """Writes a tetrahedral mesh with a "material" cell data (see
+    MATERIAL_TAGS) to any format supported by meshio (eg. .xdmf or .msh).
+    Requires meshio.
+    Args:
+        nodes (np.ndarray): (N, 3) nodes
+        cells (dict): (M, 4) tetrahedra of each material
+        filename (str): the mesh file
+    """
+    try:
+        import meshio
+    except ImportError as e:
+        raise ImportError("meshio is required to write the meshes") from e
+
+    materials = [material for material in cells if len(cells[material]) > 0]
+    mesh = meshio.Mesh(
+        nodes,
+        [("tetra", cells[material]) for material in materials],
+        cell_data={
+            "material": [
+                np.full(len(cells[material]), MATERIAL_TAGS[material])
+                for material in materials
+            ]
+        },
+    )
+    mesh.write(filename)
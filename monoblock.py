@@ -1,11 +1,89 @@
 import cadquery as cq
 import OCP
+from tracing import stage, count
 
+import copy
 import os
+from math import pi
+
+# densities of the materials of the monoblocks (g/mm3)
+DENSITIES = {"tungsten": 19.3e-3, "copper": 8.96e-3, "cucrzr": 8.9e-3}
 
 # construction
 
 
+def centre_offset(
+    height,
+    cucrzr_inner_radius,
+    cucrzr_thickness,
+    cu_thickness,
+    w_thickness,
+    **kwargs,
+):
+    """Computes the offset of the centre of a monoblock from its location,
+    along the y direction of its plane
+    Args:
+        height (float): height of the monoblock (mm)
+        cucrzr_inner_radius (float): inner radius of the CuCrZr pipe (mm)
+        cucrzr_thickness (float): thickness of the CuCrZr pipe (mm)
+        cu_thickness (float): thickness of the Cu interlayer (mm)
+        w_thickness (float): thickness of W above the Cu (mm)
+        kwargs: other arguments of the monoblock (ignored)
+    Returns:
+        float: the offset (mm)
+    """
+    return height / 2 - (
+        cucrzr_inner_radius + cucrzr_thickness + cu_thickness + w_thickness
+    )
+
+
+def monoblock_properties(
+    thickness,
+    height,
+    width,
+    cucrzr_inner_radius,
+    cucrzr_thickness,
+    cu_thickness,
+    gap,
+    hollow=True,
+    **kwargs,
+):
+    """Computes the volume and mass of each material of a monoblock and its
+    plasma-facing area in closed form, without building it
+    Args:
+        thickness (float): thickness of the monoblock (mm)
+        height (float): height of the monoblock (mm)
+        width (float): width of the monoblock (mm)
+        cucrzr_inner_radius (float): inner radius of the CuCrZr pipe (mm)
+        cucrzr_thickness (float): thickness of the CuCrZr pipe (mm)
+        cu_thickness (float): thickness of the Cu interlayer (mm)
+        gap (float): poloidal gap between two monoblocks (mm)
+        hollow (bool, optional): if False, the copper is a full cylinder.
+            Defaults to True.
+        kwargs: other arguments of the monoblock (ignored)
+    Returns:
+        dict: "volume" (mm3) and "mass" (g) of each material and
+            "plasma_facing_area" (mm2), the top face of the tungsten
+    """
+    cucrzr_outer_radius = cucrzr_inner_radius + cucrzr_thickness
+    copper_outer_radius = cucrzr_outer_radius + cu_thickness
+    copper_inner_radius = cucrzr_outer_radius if hollow else 0
+    volumes = {
+        "tungsten": (width * height - pi * copper_outer_radius**2) * thickness,
+        "copper": pi * (copper_outer_radius**2 - copper_inner_radius**2) * thickness,
+        "cucrzr": pi
+        * (cucrzr_outer_radius**2 - cucrzr_inner_radius**2)
+        * (thickness + gap),
+    }
+    return dict(
+        volume=volumes,
+        mass={
+            material: volumes[material] * DENSITIES[material] for material in volumes
+        },
+        plasma_facing_area=width * thickness,
+    )
+
+
 class Monoblock:
     def __init__(
         self,
@@ -21,6 +99,8 @@ class Monoblock:
         location=(0, 0, 0),
         normal=(0, 0, 1),
         xDir=None,
+        method="boolean",
+        cache=None,
     ) -> None:
         """_summary_
         Args:
@@ -33,6 +113,13 @@ class Monoblock:
             w_thickness (float): thickness of W above the Cu
                 (in the middle of the MB) (mm)
             gap (float): Poloidal gap between two monoblocks (mm)
+            method (str, optional): "boolean" builds the solids with
+                cylinders and a box cut from each other, "extrude" extrudes
+                the 2D cross-sections of the materials without any 3D
+                boolean operation. Defaults to "boolean".
+            cache (GeometryCache, optional): if given, the solids are loaded
+                from this cache when available and saved in it otherwise.
+                Defaults to None.
         """
         self.thickness = thickness
         self.height = height
@@ -46,53 +133,178 @@ class Monoblock:
         self.normal = normal
         self.xDir = xDir
         self.hollow = hollow
+        self.method = method
+        self.cache = cache
+        self.prototype = None
         self.plane = cq.Plane(self.location, normal=self.normal, xDir=self.xDir)
         self.make_solid()
 
-    def make_solid(self):
-
-        inner_cylinder = cq.Workplane(self.plane).cylinder(
-            self.thickness * 2,
-            self.cucrzr_inner_radius,
+    def parameters(self):
+        """Returns the arguments of the monoblock (except the cache)
+        Returns:
+            dict: the arguments
+        """
+        return dict(
+            thickness=self.thickness,
+            height=self.height,
+            width=self.width,
+            cucrzr_inner_radius=self.cucrzr_inner_radius,
+            cucrzr_thickness=self.cucrzr_thickness,
+            cu_thickness=self.cu_thickness,
+            w_thickness=self.w_thickness,
+            gap=self.gap,
+            hollow=self.hollow,
+            location=self.location,
+            normal=self.normal,
+            xDir=self.xDir,
+            method=self.method,
         )
 
-        cucrzr = (
-            cq.Workplane(self.plane)
-            .cylinder(
-                self.thickness + self.gap,
-                self.cucrzr_inner_radius + self.cucrzr_thickness,
-            )
-            .cut(inner_cylinder)
-        )
+    def properties(self):
+        """Computes the volume and mass of each material and the
+        plasma-facing area in closed form (see monoblock_properties)
+        Returns:
+            dict: "volume" (mm3) and "mass" (g) of each material and
+                "plasma_facing_area" (mm2)
+        """
+        return monoblock_properties(**self.parameters())
 
-        copper = cq.Workplane(self.plane).cylinder(
-            self.thickness,
-            self.cucrzr_inner_radius + self.cucrzr_thickness + self.cu_thickness,
-        )
-        if self.hollow:
-            copper = copper.cut(cucrzr).cut(inner_cylinder)
-
-        translation_factor = (
-            -self.height / 2
-            + self.cucrzr_inner_radius
-            + self.cucrzr_thickness
-            + self.cu_thickness
-            + self.w_thickness
-        )
+    def make_solid(self):
+        if self.cache is not None:
+            key = self.cache.key("Monoblock", self.parameters())
+            solids = self.cache.load(key, ["tungsten", "copper", "cucrzr"])
+            if solids is not None:
+                self.tungsten = solids["tungsten"]
+                self.copper = solids["copper"]
+                self.cucrzr = solids["cucrzr"]
+                return
 
-        tungsten = (
-            cq.Workplane(self.plane)
-            .move(0, -translation_factor)
-            .box(self.width, self.height, self.thickness)
-            .cut(copper)
-            .cut(cucrzr)
-            .cut(inner_cylinder)
-        )
+        if self.method == "boolean":
+            tungsten, copper, cucrzr = self.make_solid_boolean()
+        elif self.method == "extrude":
+            tungsten, copper, cucrzr = self.make_solid_extrude()
+        else:
+            raise ValueError("unknown method {}".format(self.method))
 
         self.tungsten = tungsten
         self.copper = copper
         self.cucrzr = cucrzr
 
+        if self.cache is not None:
+            self.cache.save(
+                key, {"tungsten": tungsten, "copper": copper, "cucrzr": cucrzr}
+            )
+
+    def make_solid_boolean(self):
+        """Builds the solids with cylinders and a box cut from each other
+        Returns:
+            cq.Workplane, cq.Workplane, cq.Workplane: the tungsten, copper and
+                cucrzr
+        """
+        with stage("monoblock build", hollow=self.hollow, method="boolean"):
+            inner_cylinder = cq.Workplane(self.plane).cylinder(
+                self.thickness * 2,
+                self.cucrzr_inner_radius,
+            )
+
+            cucrzr = (
+                cq.Workplane(self.plane)
+                .cylinder(
+                    self.thickness + self.gap,
+                    self.cucrzr_inner_radius + self.cucrzr_thickness,
+                )
+                .cut(inner_cylinder)
+            )
+
+            copper = cq.Workplane(self.plane).cylinder(
+                self.thickness,
+                self.cucrzr_inner_radius + self.cucrzr_thickness + self.cu_thickness,
+            )
+            if self.hollow:
+                copper = copper.cut(cucrzr).cut(inner_cylinder)
+
+            tungsten = (
+                cq.Workplane(self.plane)
+                .move(0, centre_offset(**self.parameters()))
+                .box(self.width, self.height, self.thickness)
+                .cut(copper)
+                .cut(cucrzr)
+                .cut(inner_cylinder)
+            )
+            count("boolean", 6 if self.hollow else 4)
+        return tungsten, copper, cucrzr
+
+    def make_solid_extrude(self):
+        """Builds the solids by extruding their cross-sections (rectangle
+        with a hole, annuli) along the normal of the monoblock
+        Returns:
+            cq.Workplane, cq.Workplane, cq.Workplane: the tungsten, copper and
+                cucrzr
+        """
+        cucrzr_outer_radius = self.cucrzr_inner_radius + self.cucrzr_thickness
+        copper_outer_radius = cucrzr_outer_radius + self.cu_thickness
+        offset = centre_offset(**self.parameters())
+        with stage("monoblock build", hollow=self.hollow, method="extrude"):
+            cucrzr = (
+                cq.Workplane(self.plane)
+                .workplane(offset=-(self.thickness + self.gap) / 2)
+                .circle(cucrzr_outer_radius)
+                .circle(self.cucrzr_inner_radius)
+                .extrude(self.thickness + self.gap)
+            )
+
+            copper = (
+                cq.Workplane(self.plane)
+                .workplane(offset=-self.thickness / 2)
+                .circle(copper_outer_radius)
+            )
+            if self.hollow:
+                copper = copper.circle(cucrzr_outer_radius)
+            copper = copper.extrude(self.thickness)
+
+            tungsten = (
+                cq.Workplane(self.plane)
+                .workplane(offset=-self.thickness / 2)
+                .center(0, offset)
+                .rect(self.width, self.height)
+                .center(0, -offset)
+                .circle(copper_outer_radius)
+                .extrude(self.thickness)
+            )
+        return tungsten, copper, cucrzr
+
+    def placed(self, location=(0, 0, 0), normal=(0, 0, 1), xDir=None):
+        """Creates a copy of the monoblock moved to a new plane. The solids
+        are not rebuilt, they share the geometry of this monoblock and only
+        their location changes. The monoblock from which the solids were
+        built is stored in the prototype attribute of the copy.
+        Args:
+            location (tuple, optional): origin of the new plane.
+                Defaults to (0, 0, 0).
+            normal (tuple, optional): normal of the new plane.
+                Defaults to (0, 0, 1).
+            xDir (tuple, optional): x direction of the new plane.
+                Defaults to None.
+        Returns:
+            Monoblock: the placed monoblock
+        """
+        plane = cq.Plane(location, normal=normal, xDir=xDir)
+        relative_location = cq.Location(plane) * cq.Location(self.plane).inverse
+
+        new_mb = copy.copy(self)
+        new_mb.location = location
+        new_mb.normal = normal
+        new_mb.xDir = xDir
+        new_mb.plane = plane
+        new_mb.prototype = self if self.prototype is None else self.prototype
+        for name in ["tungsten", "copper", "cucrzr"]:
+            solid = getattr(self, name)
+            moved_solid = cq.Workplane(plane).add(
+                [obj.moved(relative_location) for obj in solid.vals()]
+            )
+            setattr(new_mb, name, moved_solid)
+        return new_mb
+
 
 if __name__ == "__main__":
     my_mb = Monoblock(
@@ -0,0 +1,202 @@
+import cadquery as cq
+from fuse import fuse
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from io import BytesIO
+import os
+import time
+
+
+def to_brep(workplane):
+    """Serializes the shapes of a workplane to binary BREP
+    Args:
+        workplane (cq.Workplane): the workplane
+    Returns:
+        list: one bytes object per shape of the workplane
+    """
+    breps = []
+    for obj in workplane.vals():
+        stream = BytesIO()
+        obj.exportBin(stream)
+        breps.append(stream.getvalue())
+    return breps
+
+
+def from_brep(breps):
+    """Deserializes shapes serialized with to_brep
+    Args:
+        breps (list): list of bytes objects
+    Returns:
+        cq.Workplane: a workplane holding the shapes
+    """
+    return cq.Workplane("XY").add([cq.Shape.importBin(BytesIO(brep)) for brep in breps])
+
+
+def nb_workers(n_jobs):
+    """Computes the number of worker processes
+    Args:
+        n_jobs (int): requested number of jobs, -1 meaning all the CPUs
+    Returns:
+        int: the number of worker processes
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(n_jobs, 1)
+
+
+def split(items, nb_chunks):
+    """Splits a list in contiguous chunks of similar sizes
+    Args:
+        items (list): the list to split
+        nb_chunks (int): number of chunks
+    Returns:
+        list: list of non empty chunks
+    """
+    nb_chunks = min(nb_chunks, len(items))
+    chunks = []
+    start = 0
+    for i in range(nb_chunks):
+        end = start + len(items) // nb_chunks + (i < len(items) % nb_chunks)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def run(function, args_list, n_jobs=1):
+    """Calls a function for each set of arguments, in a process pool if
+    n_jobs is greater than 1. The results are returned in the order of
+    args_list whatever the number of jobs.
+    Args:
+        function (callable): a picklable (module level) function
+        args_list (list): list of tuples of arguments
+        n_jobs (int, optional): number of worker processes, -1 meaning all
+            the CPUs. Defaults to 1.
+    Returns:
+        list: the results
+    """
+    n_workers = min(nb_workers(n_jobs), len(args_list))
+    if n_workers <= 1:
+        return [function(*args) for args in args_list]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(function, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+
+def timed(function, args):
+    """Calls a function and measures its duration
+    Args:
+        function (callable): the function
+        args (tuple): the arguments
+    Returns:
+        object, dict: the result and the start (s), duration (s) and pid of
+            the call
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    timing = dict(start=start, duration=time.perf_counter() - start, pid=os.getpid())
+    return result, timing
+
+
+def dependency_name(dependency):
+    """Returns the node name of a dependency
+    Args:
+        dependency (str or tuple): a node name or a (node name, key) tuple
+            selecting an item of the result of the node
+    Returns:
+        str: the node name
+    """
+    return dependency[0] if isinstance(dependency, tuple) else dependency
+
+
+def topological_order(nodes):
+    """Sorts the nodes of a graph so that each node comes after its
+    dependencies
+    Args:
+        nodes (dict): (function, args, dependencies) of each node name (see
+            schedule)
+    Raises:
+        ValueError: if a dependency is unknown or if the graph has a cycle
+    Returns:
+        list: the names of the nodes
+    """
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError("cycle in the graph involving {}".format(name))
+        if name not in nodes:
+            raise ValueError("unknown node {}".format(name))
+        visiting.add(name)
+        for dependency in nodes[name][2]:
+            visit(dependency_name(dependency))
+        visiting.remove(name)
+        order.append(name)
+
+    for name in nodes:
+        visit(name)
+    return order
+
+
+def schedule(nodes, n_jobs=1):
+    """Runs a graph of tasks, in a process pool if n_jobs is greater than 1.
+    A node is submitted as soon as all its dependencies are done.
+    Args:
+        nodes (dict): (function, args, dependencies) of each node name.
+            The function is called with args followed by the results of the
+            dependencies and must be picklable (module level) as well as its
+            arguments and results. A dependency is a node name or a (node
+            name, key) tuple, in which case only result[key] of the node is
+            passed (and sent to the worker process).
+        n_jobs (int, optional): number of worker processes, -1 meaning all
+            the CPUs. Defaults to 1.
+    Returns:
+        dict, dict: the result and the timing (see timed) of each node
+    """
+    order = topological_order(nodes)
+    results, timings = {}, {}
+
+    def dependency_result(dependency):
+        if isinstance(dependency, tuple):
+            name, key = dependency
+            return results[name][key]
+        return results[dependency]
+
+    def arguments(name):
+        function, args, dependencies = nodes[name]
+        return function, tuple(args) + tuple(map(dependency_result, dependencies))
+
+    n_workers = min(nb_workers(n_jobs), len(nodes))
+    if n_workers <= 1:
+        for name in order:
+            results[name], timings[name] = timed(*arguments(name))
+        return results, timings
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        remaining = list(order)
+        running = {}
+        while remaining or running:
+            for name in list(remaining):
+                if all(dependency_name(d) in results for d in nodes[name][2]):
+                    remaining.remove(name)
+                    running[executor.submit(timed, *arguments(name))] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+    return results, timings
+
+
+def fuse_worker(breps_list, parallel=False):
+    """Fuses serialized workplanes, to be run in a worker process
+    Args:
+        breps_list (list): list of serialized workplanes
+        parallel (bool, optional): OCC parallel mode. Defaults to False.
+    Returns:
+        list: the serialized fused workplane
+    """
+    return to_brep(fuse([from_brep(breps) for breps in breps_list], parallel=parallel))
@@ -1,92 +1,603 @@
-from monoblock import Monoblock
+from monoblock import Monoblock, centre_offset, monoblock_properties
+from monoblock import DENSITIES as MONOBLOCK_DENSITIES
+from fuse import fuse, compound
+from tracing import stage, count
+from parallel import run, split, nb_workers, to_brep, from_brep, fuse_worker
+from placement import plan_placements, nb_monoblocks_on_curve
+from placement import interferences as find_interferences
+from centreline import Centreline
+from transforms import moved, translation
 from cadquery import exporters
 import cadquery as cq
 
 import numpy as np
+import warnings
+
+MATERIALS = ["tungsten", "copper", "tube", "water"]
+
+# densities of the materials (g/mm3), the tube being made of CuCrZr
+DENSITIES = {
+    "tungsten": MONOBLOCK_DENSITIES["tungsten"],
+    "copper": MONOBLOCK_DENSITIES["copper"],
+    "tube": MONOBLOCK_DENSITIES["cucrzr"],
+    "water": 1.0e-3,
+}
+
+# arguments of PFU that are not passed to the monoblocks
+PFU_ARGUMENTS = [
+    "L",
+    "target_radius",
+    "angle",
+    "nb_mbs_on_curve",
+    "use_prototypes",
+    "parallel_fuse",
+    "fuse",
+    "n_jobs",
+    "cache",
+    "tube_method",
+    "validate",
+]
+
+# parameters and products each intermediate product of a PFU depends on,
+# products being listed after their dependencies. "monoblocks" are the placed
+# monoblocks with their cut copper and "monoblocks_args" stands for any
+# argument of the monoblocks. The monoblock prototypes are not listed: they
+# are keyed by their arguments and never invalidated.
+PFU_DEPENDENCIES = {
+    "monoblocks": [
+        "L",
+        "target_radius",
+        "angle",
+        "nb_mbs_on_curve",
+        "use_prototypes",
+        "monoblocks_args",
+    ],
+    "tube": [
+        "L",
+        "target_radius",
+        "angle",
+        "tube_method",
+        "cucrzr_inner_radius",
+        "cucrzr_thickness",
+    ],
+    "water": ["L", "target_radius", "angle", "tube_method", "cucrzr_inner_radius"],
+    "tungsten": ["monoblocks", "fuse"],
+    "copper": ["monoblocks", "fuse"],
+}
+
+
+def invalidated(dependencies, changed):
+    """Finds the products invalidated by changed parameters
+    Args:
+        dependencies (dict): parameters and products each product depends
+            on, products being listed after their dependencies
+        changed (set): names of the changed parameters
+    Returns:
+        set: the invalidated products
+    """
+    changed = set(changed)
+    products = set()
+    for product, product_dependencies in dependencies.items():
+        if changed.intersection(product_dependencies):
+            products.add(product)
+            changed.add(product)
+    return products
+
+
+def material_property(material):
+    """Creates a property computing a material on first access
+    Args:
+        material (str): name of the material
+    Returns:
+        property: the property
+    """
+
+    def getter(self):
+        return self.get(material)
+
+    def setter(self, value):
+        self.solids[material] = value
+
+    return property(getter, setter, doc="{} solid".format(material))
 
 
 class PFU:
     def __init__(
-        self, L, target_radius, angle, nb_mbs_on_curve=27, **monoblocks_args
+        self,
+        L,
+        target_radius,
+        angle,
+        nb_mbs_on_curve=None,
+        use_prototypes=True,
+        parallel_fuse=False,
+        fuse=True,
+        n_jobs=1,
+        cache=None,
+        tube_method="boolean",
+        validate=True,
+        **monoblocks_args,
     ) -> None:
+        """
+        Args:
+            L (float): length of the straight part of the PFU (mm)
+            target_radius (float): radius of the curved part of the PFU (mm)
+            angle (float): angle of the curved part of the PFU (deg)
+            nb_mbs_on_curve (int, optional): number of monoblocks on the
+                curved part. Defaults to None (as many monoblocks as the
+                thickness and gap allow).
+            use_prototypes (bool, optional): if True, each unique monoblock
+                is only built once and the others are placed copies of it.
+                Defaults to True.
+            parallel_fuse (bool, optional): if True, the OCC fuse operations
+                run in parallel mode. Defaults to False.
+            fuse (bool, optional): if False, the monoblocks are not fused
+                and the tungsten and copper are compounds of the individual
+                monoblocks solids. Defaults to True.
+            n_jobs (int, optional): number of worker processes used to cut
+                the tube from the monoblocks and fuse the materials, -1
+                meaning all the CPUs. Defaults to 1.
+            cache (GeometryCache, optional): if given, the materials of the
+                PFU and the monoblocks are loaded from this cache when
+                available and saved in it otherwise. Defaults to None.
+            tube_method (str, optional): "boolean" builds the tube and water
+                with extrusions and revolutions fused together, "sweep"
+                sweeps their profiles along the centreline of the PFU in a
+                single operation each (see Centreline). Defaults to
+                "boolean".
+            validate (bool, optional): if True, the monoblocks are checked
+                for interferences (see PFU.check_interferences) before
+                building them. Defaults to True.
+            monoblocks_args: arguments passed to Monoblock
+        """
 
         self.L = L
         self.target_radius = target_radius
         self.angle = angle
 
-        self.nb_mbs_on_curve = (
-            nb_mbs_on_curve  # ideally this should be computed from gap
-        )
-
         self.monoblocks_args = monoblocks_args
+        self.auto_nb_mbs_on_curve = nb_mbs_on_curve is None
+        if nb_mbs_on_curve is None:
+            nb_mbs_on_curve = self.max_nb_mbs_on_curve()
+        self.nb_mbs_on_curve = nb_mbs_on_curve
+        self.use_prototypes = use_prototypes
+        self.parallel_fuse = parallel_fuse
+        self.fuse = fuse
+        self.n_jobs = n_jobs
+        self.cache = cache
+        self.tube_method = tube_method
+        self.validate = validate
+
+        self.prototypes = {}
+
+        self.solids = {}
+        self.source = None
+        self.monoblocks = None
+
+    tungsten = material_property("tungsten")
+    copper = material_property("copper")
+    tube = material_property("tube")
+    water = material_property("water")
+
+    @property
+    def monoblocks(self):
+        """Monoblocks of the PFU, built on first access"""
+        if self._monoblocks is None:
+            with stage("monoblocks placement"):
+                self._monoblocks = self.make_monoblocks()
+        return self._monoblocks
+
+    @monoblocks.setter
+    def monoblocks(self, value):
+        self._monoblocks = value
+        self.tube_cut = False
 
     def make_solid(self):
-        self.tube, self.water = self.make_tube()
+        """Builds the tungsten, copper, tube and water of the PFU"""
+        self.build()
+
+    def get(self, material):
+        """Returns a material of the PFU, building it if needed
+        Args:
+            material (str): "tungsten", "copper", "tube" or "water"
+        Returns:
+            cq.Workplane: the material
+        """
+        if material not in self.solids:
+            self.build([material])
+        return self.solids[material]
+
+    def build(self, materials=MATERIALS):
+        """Builds the materials of the PFU that are not built yet. Only the
+        operations needed by the requested materials are performed: the
+        monoblocks are not built for the tube and water, and the tube is
+        only cut from the monoblocks for the copper.
+        Args:
+            materials (list, optional): materials to build.
+                Defaults to ["tungsten", "copper", "tube", "water"].
+        """
+        missing = [material for material in materials if material not in self.solids]
+        if len(missing) == 0:
+            return
+
+        if self.source is not None:
+            base_pfu, vector = self.source
+            for material in missing:
+                solid = base_pfu.get(material)
+                with stage("transform", material=material):
+                    self.solids[material] = moved(solid, translation(vector))
+            return
+
+        if self.cache is not None:
+            for material in missing:
+                solids = self.cache.load(self.cache_key(material), [material])
+                if solids is not None:
+                    self.solids[material] = solids[material]
+            missing = [material for material in missing if material not in self.solids]
+
+        mb_materials = [m for m in ["tungsten", "copper"] if m in missing]
+        if self.validate and mb_materials:
+            self.check_interferences()
+
+        built = {}
+        if "tube" in missing or "water" in missing:
+            with stage("tube build") as tube_stage:
+                built["tube"], built["water"] = self.make_tube()
+                tube_stage.set_shape(built["tube"])
+
+        monoblocks = self.monoblocks if mb_materials else []
+        if "copper" in mb_materials and not self.tube_cut:
+            self.cut_tube_from_mbs()
+
+        if not self.fuse:
+            for material in mb_materials:
+                with stage("compound", material=material):
+                    built[material] = compound(
+                        [getattr(mb, material) for mb in monoblocks]
+                    )
+        elif nb_workers(self.n_jobs) > 1 and len(mb_materials) > 1:
+            mb_solids = {
+                material: [to_brep(getattr(mb, material)) for mb in monoblocks]
+                for material in mb_materials
+            }
+            with stage("fuse", material=", ".join(mb_materials)):
+                results = run(
+                    fuse_worker,
+                    [
+                        (mb_solids[material], self.parallel_fuse)
+                        for material in mb_materials
+                    ],
+                    n_jobs=self.n_jobs,
+                )
+                count("boolean", len(mb_materials))
+            for material, result in zip(mb_materials, results):
+                built[material] = from_brep(result)
+        else:
+            for material in mb_materials:
+                with stage("fuse", material=material) as fuse_stage:
+                    built[material] = fuse(
+                        [getattr(mb, material) for mb in monoblocks],
+                        parallel=self.parallel_fuse,
+                    )
+                    fuse_stage.set_shape(built[material])
+
+        for material, solid in built.items():
+            if material in self.solids:
+                continue
+            self.solids[material] = solid
+            if self.cache is not None:
+                self.cache.save(self.cache_key(material), {material: solid})
+
+    def set_params(self, **params):
+        """Changes arguments of the PFU and invalidates the intermediate
+        products depending on them (see PFU_DEPENDENCIES). The other
+        products are kept and only the invalidated ones are built again, on
+        first access or with PFU.rebuild. The monoblock prototypes are
+        always kept and reused by the monoblocks with the same arguments.
+        Args:
+            params: arguments of PFU (see PFU.__init__)
+        Raises:
+            ValueError: if the PFU is a translated copy of another PFU
+        Returns:
+            set: the invalidated products
+        """
+        changed = set()
+        for name, value in params.items():
+            if name == "nb_mbs_on_curve":
+                self.auto_nb_mbs_on_curve = value is None
+                if value is None:
+                    continue
+            if name in PFU_ARGUMENTS:
+                if getattr(self, name) != value:
+                    setattr(self, name, value)
+                    changed.add(name)
+            elif name not in self.monoblocks_args or (
+                self.monoblocks_args[name] != value
+            ):
+                self.monoblocks_args[name] = value
+                changed.update([name, "monoblocks_args"])
+
+        if self.auto_nb_mbs_on_curve:
+            nb_mbs_on_curve = self.max_nb_mbs_on_curve()
+            if nb_mbs_on_curve != self.nb_mbs_on_curve:
+                self.nb_mbs_on_curve = nb_mbs_on_curve
+                changed.add("nb_mbs_on_curve")
+
+        products = invalidated(PFU_DEPENDENCIES, changed)
+        if products and self.source is not None:
+            raise ValueError(
+                "the parameters of a translated PFU can't be changed, "
+                "change those of its base PFU"
+            )
+        if "monoblocks" in products:
+            self.monoblocks = None
+        for material in MATERIALS:
+            if material in products:
+                self.solids.pop(material, None)
+        return products
+
+    def rebuild(self, materials=MATERIALS):
+        """Builds the materials invalidated by PFU.set_params, reusing the
+        intermediate products that are still valid
+        Args:
+            materials (list, optional): materials to build.
+                Defaults to ["tungsten", "copper", "tube", "water"].
+        """
+        self.build(materials)
+
+    def translated(self, vector):
+        """Creates a PFU whose materials are translated copies of the
+        materials of this PFU, computed on first access. The copies share
+        the geometry of this PFU, only their location changes.
+        Args:
+            vector (cq.Vector): the translation vector
+        Returns:
+            PFU: the translated PFU
+        """
+        new_pfu = PFU(**self.parameters())
+        new_pfu.source = (self, vector)
+        return new_pfu
+
+    def cache_key(self, material):
+        """Computes the cache key of a material of the PFU
+        Args:
+            material (str): the material
+        Returns:
+            str: the key
+        """
+        return self.cache.key(
+            "PFU",
+            dict(material=material, fuse=self.fuse, **self.geometry_parameters()),
+        )
 
-        self.monoblocks = self.make_monoblocks()
+    def to_assembly(self, name="pfu"):
+        """Creates an assembly of the PFU with one child per material. If
+        the monoblocks are not fused, each monoblock solid is a child of its
+        material named <material>_<index of the monoblock>.
+        Args:
+            name (str, optional): name of the assembly. Defaults to "pfu".
+        Returns:
+            cq.Assembly: the assembly
+        """
+        assembly = cq.Assembly(name=name)
+        for material in MATERIALS:
+            shape = self.get(material).val()
+            if self.fuse or material not in ["tungsten", "copper"]:
+                assembly.add(shape, name=material)
+                continue
+            material_assembly = cq.Assembly(name=material)
+            for i, monoblock_shape in enumerate(shape):
+                material_assembly.add(monoblock_shape, name="{}_{}".format(material, i))
+            assembly.add(material_assembly)
+        return assembly
+
+    def geometry_parameters(self):
+        """Returns the arguments defining the geometry of the PFU
+        Returns:
+            dict: the arguments
+        """
+        return dict(
+            L=self.L,
+            target_radius=self.target_radius,
+            angle=self.angle,
+            nb_mbs_on_curve=self.nb_mbs_on_curve,
+            tube_method=self.tube_method,
+            **self.monoblocks_args,
+        )
 
-        self.cut_tube_from_mbs()
+    def parameters(self):
+        """Returns the arguments needed to create an identical PFU
+        Returns:
+            dict: the arguments
+        """
+        return dict(
+            use_prototypes=self.use_prototypes,
+            parallel_fuse=self.parallel_fuse,
+            fuse=self.fuse,
+            cache=self.cache,
+            validate=self.validate,
+            **self.geometry_parameters(),
+        )
 
-        self.tungsten = self.monoblocks[0].tungsten
-        for mb in self.monoblocks[1:]:
-            self.tungsten = self.tungsten.union(mb.tungsten)
+    def make_monoblocks(self):
+        return [
+            self.make_monoblock(**placement)
+            for placement in self.monoblock_placements()
+        ]
 
-        self.copper = self.monoblocks[0].copper
-        for mb in self.monoblocks[1:]:
-            self.copper = self.copper.union(mb.copper)
+    def plan(self):
+        """Computes the locations and orientations of the monoblocks without
+        building them (see placement.plan_placements)
+        Returns:
+            dict: "locations", "normals", "xDirs" and "curved" arrays
+        """
+        return plan_placements(
+            self.L,
+            self.target_radius,
+            self.angle,
+            self.monoblocks_args["thickness"],
+            self.monoblocks_args["gap"],
+            self.nb_mbs_on_curve,
+        )
 
-    def make_monoblocks(self):
-        # monoblocks on straight line
-        if self.L == 0:
-            locations = []
-        else:
-            locations = np.arange(
-                0,
-                self.L,
-                step=self.monoblocks_args["thickness"] + self.monoblocks_args["gap"],
-            )
+    def curve_monoblocks_args(self):
+        """Returns the arguments of the monoblocks of the curved part
+        Returns:
+            dict: the arguments
+        """
+        return dict(
+            thickness=self.monoblocks_args["thickness"],
+            height=2.5,
+            width=2.3,
+            cucrzr_inner_radius=self.monoblocks_args["cucrzr_inner_radius"],
+            cucrzr_thickness=self.monoblocks_args["cucrzr_thickness"],
+            w_thickness=0.5,
+            cu_thickness=0.1,
+            gap=self.monoblocks_args["gap"],
+            method=self.monoblocks_args.get("method", "boolean"),
+        )
 
-        monoblocks_straight = [
-            Monoblock(
-                **self.monoblocks_args,
-                location=(0, y_loc, 0),
-                normal=(0, 1, 0),
-                hollow=False,
-            )
-            for y_loc in locations
-        ]
-        # monoblocks on curve
-        monoblocks_curve = []
-        thetas = np.linspace(
-            np.pi * 0.999, (180 - self.angle) * np.pi / 180, num=self.nb_mbs_on_curve
+    def max_nb_mbs_on_curve(self):
+        """Computes the largest number of monoblocks fitting on the curved
+        part without intersecting (see placement.nb_monoblocks_on_curve)
+        Returns:
+            int: number of monoblocks
+        """
+        args = self.curve_monoblocks_args()
+        return nb_monoblocks_on_curve(
+            self.target_radius,
+            self.angle,
+            args["thickness"],
+            args["gap"],
+            # the y direction of the curved monoblocks points towards the
+            # centre of curvature
+            inner_extent=args["height"] / 2 + centre_offset(**args),
         )
 
-        for theta in thetas:
-            x_loc = self.target_radius + self.target_radius * np.cos(theta)
-            y_loc = self.L + self.target_radius * np.sin(theta)
-
-            x_normal = np.sin(theta)
-            y_normal = -np.cos(theta)
-
-            monoblocks_curve.append(
-                Monoblock(
-                    thickness=self.monoblocks_args["thickness"],
-                    height=2.5,
-                    width=2.3,
-                    cucrzr_inner_radius=self.monoblocks_args["cucrzr_inner_radius"],
-                    cucrzr_thickness=self.monoblocks_args["cucrzr_thickness"],
-                    w_thickness=0.5,
-                    cu_thickness=0.1,
-                    gap=self.monoblocks_args["gap"],
-                    location=(x_loc, y_loc, 0),
-                    normal=(x_normal, y_normal, 0),
-                    xDir=(0, 0, 1),
+    def monoblock_placements(self, check=True):
+        """Computes the arguments of all the monoblocks of the PFU
+        Args:
+            check (bool, optional): if True, a warning is raised if
+                monoblocks intersect (see PFU.interferences).
+                Defaults to True.
+        Returns:
+            list: list of dicts of arguments for make_monoblock
+        """
+        plan = self.plan()
+        curve_args = self.curve_monoblocks_args()
+        placements = []
+        for location, normal, xDir, curved in zip(
+            plan["locations"], plan["normals"], plan["xDirs"], plan["curved"]
+        ):
+            placements.append(
+                dict(
+                    location=tuple(location.tolist()),
+                    normal=tuple(normal.tolist()),
+                    xDir=tuple(xDir.tolist()),
                     hollow=False,
+                    **(curve_args if curved else self.monoblocks_args),
+                )
+            )
+
+        if check:
+            pairs = self.interferences(placements)
+            if len(pairs) > 0:
+                warnings.warn("monoblocks {} intersect".format(pairs.tolist()))
+        return placements
+
+    def interferences(self, placements=None):
+        """Finds the pairs of intersecting monoblocks from the oriented
+        bounding boxes of their planned placements, without building them
+        (see placement.interferences)
+        Args:
+            placements (list, optional): arguments of the monoblocks.
+                Defaults to None (see PFU.monoblock_placements).
+        Returns:
+            np.ndarray: (K, 2) indices i < j of the intersecting monoblocks
+        """
+        if placements is None:
+            placements = self.monoblock_placements(check=False)
+        return find_interferences(
+            self.plan(),
+            thickness=np.array([p["thickness"] for p in placements]),
+            height=np.array([p["height"] for p in placements]),
+            offset=np.array([centre_offset(**p) for p in placements]),
+        )
+
+    def check_interferences(self):
+        """Checks that the monoblocks don't intersect before any geometry is
+        built (see PFU.interferences)
+        Raises:
+            ValueError: if monoblocks intersect
+        """
+        with stage("interference check"):
+            pairs = self.interferences()
+        if len(pairs) == 0:
+            return
+
+        thickness = self.monoblocks_args["thickness"]
+        gap = self.monoblocks_args["gap"]
+        curved = self.plan()["curved"]
+        # a straight monoblock and a curved one
+        junction = curved[pairs[:, 0]] != curved[pairs[:, 1]]
+        messages = []
+        if junction.any():
+            messages.append(
+                "monoblocks {} intersect at the junction of the straight and "
+                "curved parts, L ({:g} mm) is not a multiple of thickness + gap "
+                "({:g} mm)".format(pairs[junction].tolist(), self.L, thickness + gap)
+            )
+        if not junction.all():
+            messages.append(
+                "monoblocks {} intersect on the curved part, reduce "
+                "nb_mbs_on_curve (at most {}) or increase the gap".format(
+                    pairs[~junction].tolist(), self.max_nb_mbs_on_curve()
                 )
             )
-        return monoblocks_straight + monoblocks_curve
+        raise ValueError("; ".join(messages))
+
+    def make_monoblock(self, location, normal, xDir=None, **kwargs):
+        """Makes a monoblock. If use_prototypes is True, the monoblock is
+        built once at the origin for each unique set of arguments and then
+        placed at its location.
+        Args:
+            location (tuple): location of the monoblock
+            normal (tuple): normal of the monoblock
+            xDir (tuple, optional): x direction of the monoblock.
+                Defaults to None.
+            kwargs: other arguments passed to Monoblock
+        Returns:
+            Monoblock: the monoblock
+        """
+        if not self.use_prototypes:
+            return Monoblock(
+                location=location, normal=normal, xDir=xDir, cache=self.cache, **kwargs
+            )
+
+        key = tuple(sorted(kwargs.items()))
+        if key not in self.prototypes:
+            self.prototypes[key] = Monoblock(cache=self.cache, **kwargs)
+        return self.prototypes[key].placed(location, normal=normal, xDir=xDir)
+
+    def centreline(self):
+        """Creates the centreline of the tube: a straight part followed by an
+        arc. The other paths supported by Centreline (several arcs, splines)
+        can't be used by a PFU, whose placement of the monoblocks, local cut
+        of the tube and closed form properties are only derived for a
+        straight part followed by an arc.
+        Returns:
+            Centreline: the centreline
+        """
+        return Centreline.line_arc(self.L, self.target_radius, self.angle)
 
     def make_tube(self):
+        """Makes the CuCrZr tube and the water
+        Returns:
+            cq.Workplane, cq.Workplane: the tube and the water
+        """
+        if self.tube_method == "sweep":
+            return self.make_tube_sweep()
+        if self.tube_method != "boolean":
+            raise ValueError("unknown tube method {}".format(self.tube_method))
 
         water_2 = (
             cq.Workplane("ZX")
@@ -132,17 +643,202 @@ class PFU:
                 .extrude(self.L)
             )
 
-            tube_total = tube_1.union(tube_2).cut(water)
+            tube_total = tube_1.union(tube_2)
+            count("boolean", 2)
         else:
             tube_total = tube_2
+        tube_total = tube_total.cut(water)
+        count("boolean")
 
         return tube_total, water
 
+    def make_tube_sweep(self):
+        """Makes the CuCrZr tube and the water by sweeping an annulus and a
+        disc along the centreline
+        Returns:
+            cq.Workplane, cq.Workplane: the tube and the water
+        """
+        inner_radius = self.monoblocks_args["cucrzr_inner_radius"]
+        outer_radius = inner_radius + self.monoblocks_args["cucrzr_thickness"]
+        centreline = self.centreline()
+        tube = centreline.sweep(outer_radius, inner_radius)
+        water = centreline.sweep(inner_radius)
+        return tube, water
+
     def cut_tube_from_mbs(self):
-        """Cuts the water and CuCrZr tube from monoblocks copper to avoid overlaps"""
-        for i, mb in enumerate(self.monoblocks[:-1]):
-            mb.copper = mb.copper.cut(self.tube).cut(self.water)
-            # exporters.export(mb.copper, "monoblocks/copper_{}.stl".format(i))
+        """Cuts the water and CuCrZr tube from monoblocks copper to avoid overlaps.
+        Only the portion of the tube surrounding each monoblock is cut.
+        """
+        monoblocks = self.monoblocks
+        with stage("tube cut", nb_monoblocks=len(monoblocks)):
+            if nb_workers(self.n_jobs) > 1:
+                chunks = split(list(range(len(monoblocks))), nb_workers(self.n_jobs))
+                results = run(
+                    cut_tube_from_mbs_worker,
+                    [(self.parameters(), chunk) for chunk in chunks],
+                    n_jobs=self.n_jobs,
+                )
+                count("boolean", len(monoblocks))
+                coppers = [from_brep(brep) for result in results for brep in result]
+                for mb, copper in zip(monoblocks, coppers):
+                    mb.copper = copper
+            else:
+                for i, mb in enumerate(monoblocks):
+                    mb.copper = self.cut_tube_from_mb(mb)
+                    # exporters.export(mb.copper, "monoblocks/copper_{}.stl".format(i))
+        self.tube_cut = True
+
+    def cut_tube_from_mb(self, mb):
+        """Cuts the portion of the tube surrounding a monoblock from its copper
+        Args:
+            mb (Monoblock): the monoblock
+        Returns:
+            cq.Workplane: the cut copper
+        """
+        tube_radius = (
+            self.monoblocks_args["cucrzr_inner_radius"]
+            + self.monoblocks_args["cucrzr_thickness"]
+        )
+        abscissa = self.centreline_abscissa(mb.location)
+        half_length = (
+            mb.thickness
+            + mb.cucrzr_inner_radius
+            + mb.cucrzr_thickness
+            + mb.cu_thickness
+        )
+        tube_segment = self.make_tube_segment(
+            abscissa - half_length, abscissa + half_length, tube_radius
+        )
+        count("boolean")
+        return mb.copper.cut(tube_segment)
+
+    def properties(self):
+        """Computes the volume and mass of each material and the
+        plasma-facing area in closed form, from the placements of the
+        monoblocks, without building any geometry. The tube and water are
+        a cylinder followed by a torus section. The copper of a monoblock
+        is an annulus where the tube goes through it and a full disc beyond
+        the ends of the tube; on the curved part, the cut of the straight
+        copper cylinder by the curved tube is approximated by an annulus.
+        The volumes of the monoblocks are summed as if they didn't overlap.
+        Returns:
+            dict: "volume" (mm3) and "mass" (g) of each material and
+                "plasma_facing_area" (mm2)
+        """
+        inner_radius = self.monoblocks_args["cucrzr_inner_radius"]
+        outer_radius = inner_radius + self.monoblocks_args["cucrzr_thickness"]
+        length = self.centreline_length()
+        volumes = {
+            "tungsten": 0,
+            "copper": 0,
+            "tube": np.pi * (outer_radius**2 - inner_radius**2) * length,
+            "water": np.pi * inner_radius**2 * length,
+        }
+        plasma_facing_area = 0
+        for placement in self.monoblock_placements():
+            mb_properties = monoblock_properties(**dict(placement, hollow=False))
+            volumes["tungsten"] += mb_properties["volume"]["tungsten"]
+            plasma_facing_area += mb_properties["plasma_facing_area"]
+
+            # part of the thickness of the monoblock crossed by the tube
+            abscissa = float(self.centreline_abscissa(placement["location"]))
+            half_thickness = placement["thickness"] / 2
+            crossed = min(max(abscissa + half_thickness, 0), length) - min(
+                max(abscissa - half_thickness, 0), length
+            )
+            volumes["copper"] += mb_properties["volume"]["copper"] - (
+                np.pi * outer_radius**2 * crossed
+            )
+        return dict(
+            volume=volumes,
+            mass={
+                material: volumes[material] * DENSITIES[material]
+                for material in volumes
+            },
+            plasma_facing_area=plasma_facing_area,
+        )
+
+    def centreline_length(self):
+        """Computes the length of the tube centreline
+        Returns:
+            float: length of the centreline (mm)
+        """
+        return self.L + self.target_radius * self.angle * np.pi / 180
+
+    def centreline_abscissa(self, location):
+        """Computes the curvilinear abscissa of a point of the tube centreline
+        Args:
+            location (tuple): x, y, z coordinates of the point
+        Returns:
+            float: the abscissa (mm), 0 being the start of the straight part
+        """
+        x, y = location[0], location[1]
+        if y <= self.L:
+            return y
+        theta = np.arctan2(y - self.L, x - self.target_radius)
+        return self.L + self.target_radius * (np.pi - theta)
+
+    def make_tube_segment(self, start, end, radius):
+        """Makes the solid disc of a given radius swept along the tube
+        centreline between two curvilinear abscissas. The abscissas are
+        clipped to the extent of the tube.
+        Args:
+            start (float): start abscissa (mm)
+            end (float): end abscissa (mm)
+            radius (float): radius of the disc (mm)
+        Returns:
+            cq.Workplane: the segment (one solid on each part of the tube)
+        """
+        start = max(start, 0)
+        end = min(end, self.centreline_length())
+
+        solids = []
+        if start < self.L:
+            straight_part = (
+                cq.Workplane("ZX")
+                .workplane(offset=start)
+                .circle(radius)
+                .extrude(min(end, self.L) - start)
+            )
+            solids.append(straight_part.val())
+        if end > self.L:
+            start_angle = (max(start, self.L) - self.L) / self.target_radius
+            end_angle = (end - self.L) / self.target_radius
+            curved_part = (
+                cq.Workplane("ZX")
+                .workplane(offset=self.L)
+                .circle(radius)
+                .revolve(
+                    (end_angle - start_angle) * 180 / np.pi,
+                    (1, self.target_radius, 0),
+                    (-1, self.target_radius, 0),
+                )
+                .rotate(
+                    (self.target_radius, self.L, 1),
+                    (self.target_radius, self.L, -1),
+                    start_angle * 180 / np.pi,
+                )
+            )
+            solids.append(curved_part.val())
+        return cq.Workplane("XY").add(solids)
+
+
+def cut_tube_from_mbs_worker(pfu_parameters, indices):
+    """Builds monoblocks of a PFU and cuts the tube from their copper, to be
+    run in a worker process
+    Args:
+        pfu_parameters (dict): arguments of the PFU
+        indices (list): indices of the monoblocks to build
+    Returns:
+        list: the serialized copper of each monoblock
+    """
+    pfu = PFU(**pfu_parameters)
+    placements = pfu.monoblock_placements()
+    coppers = []
+    for i in indices:
+        mb = pfu.make_monoblock(**placements[i])
+        coppers.append(to_brep(pfu.cut_tube_from_mb(mb)))
+    return coppers
 
 
 if __name__ == "__main__":
@@ -163,9 +859,7 @@ if __name__ == "__main__":
     # attach everything
 
     print("attaching monoblocks")
-    monoblocks = my_pfu.monoblocks[0].tungsten.union(my_pfu.monoblocks[0].copper)
-    for mb in my_pfu.monoblocks[1:]:
-        monoblocks = monoblocks.union(mb.tungsten).union(mb.copper)
+    monoblocks = fuse([my_pfu.tungsten, my_pfu.copper])
 
     exporters.export(monoblocks, "monoblocks.stl")
 
@@ -173,7 +867,7 @@ if __name__ == "__main__":
 
     print("attaching monoblocks to tube")
 
-    pfu = my_pfu.tube.union(monoblocks)
+    pfu = fuse([my_pfu.tube, monoblocks])
     exporters.export(pfu, "pfu.stl")
 
     # tungsten = my_pfu.monoblocks[0].tungsten
@@ -0,0 +1,186 @@
+import numpy as np
+
+# the first monoblock of the curve is slightly rotated so that it doesn't
+# coincide with the end of the straight part
+START_ANGLE = np.pi * 0.999
+
+
+def nb_monoblocks_on_curve(target_radius, angle, thickness, gap, inner_extent=0):
+    """Computes the largest number of monoblocks fitting on the curved part
+    of a PFU with at least a gap between two monoblocks (measured on the
+    centreline) and without intersection of their sides, which get closer
+    towards the centre of curvature: two monoblocks separated by an angle
+    dtheta don't intersect as long as
+    thickness / 2 <= (target_radius - inner_extent) * tan(dtheta / 2)
+    Args:
+        target_radius (float): radius of the curved part of the PFU (mm)
+        angle (float): angle of the curved part of the PFU (deg)
+        thickness (float): thickness of the monoblocks (mm)
+        gap (float): poloidal gap between two monoblocks (mm)
+        inner_extent (float, optional): distance from the centreline to the
+            side of the monoblocks facing the centre of curvature (mm).
+            Defaults to 0.
+    Returns:
+        int: number of monoblocks on the curved part
+    """
+    end_angle = (180 - angle) * np.pi / 180
+    arc_angle = START_ANGLE - end_angle
+    if arc_angle < 0:
+        return 0
+    inner_radius = target_radius - inner_extent
+    if inner_radius <= 0:
+        # the monoblocks reach the centre of curvature
+        return 1
+    min_angle = max(
+        (thickness + gap) / target_radius, 2 * np.arctan(thickness / 2 / inner_radius)
+    )
+    return int(np.floor(arc_angle / min_angle + 1e-9)) + 1
+
+
+def plan_placements(L, target_radius, angle, thickness, gap, nb_mbs_on_curve=None):
+    """Computes the locations and orientations of the monoblocks of a PFU,
+    without building any geometry. The monoblocks on the straight part are
+    spaced by thickness + gap from y=0 to y=L, those on the curved part are
+    evenly distributed on the arc.
+    Args:
+        L (float): length of the straight part of the PFU (mm)
+        target_radius (float): radius of the curved part of the PFU (mm)
+        angle (float): angle of the curved part of the PFU (deg)
+        thickness (float): thickness of the monoblocks (mm)
+        gap (float): poloidal gap between two monoblocks (mm)
+        nb_mbs_on_curve (int, optional): number of monoblocks on the curved
+            part. Defaults to None (computed with nb_monoblocks_on_curve).
+    Returns:
+        dict: "locations", "normals" and "xDirs" (N, 3) arrays and
+            "curved" (N,) boolean array of the monoblocks, ordered along
+            the PFU
+    """
+    if nb_mbs_on_curve is None:
+        nb_mbs_on_curve = nb_monoblocks_on_curve(target_radius, angle, thickness, gap)
+
+    # monoblocks on straight line
+    if L == 0:
+        y_straight = np.zeros(0)
+    else:
+        y_straight = np.arange(0, L, step=thickness + gap)
+    nb_straight = len(y_straight)
+
+    # monoblocks on curve
+    thetas = np.linspace(START_ANGLE, (180 - angle) * np.pi / 180, num=nb_mbs_on_curve)
+
+    locations = np.zeros((nb_straight + nb_mbs_on_curve, 3))
+    locations[:nb_straight, 1] = y_straight
+    locations[nb_straight:, 0] = target_radius + target_radius * np.cos(thetas)
+    locations[nb_straight:, 1] = L + target_radius * np.sin(thetas)
+
+    normals = np.zeros_like(locations)
+    normals[:nb_straight, 1] = 1
+    normals[nb_straight:, 0] = np.sin(thetas)
+    normals[nb_straight:, 1] = -np.cos(thetas)
+
+    x_dirs = np.zeros_like(locations)
+    x_dirs[:, 2] = 1
+
+    curved = np.arange(len(locations)) >= nb_straight
+    return dict(locations=locations, normals=normals, xDirs=x_dirs, curved=curved)
+
+
+def footprints(placements, thickness, height, offset):
+    """Computes the footprints of the monoblocks in the XY plane: the
+    rectangles of size thickness x height of their oriented bounding boxes.
+    The third axis of the boxes is Z (the x direction of all the
+    monoblocks) and their extents along Z all contain 0, so two boxes
+    intersect if and only if their footprints do.
+    Args:
+        placements (dict): the placements (see plan_placements)
+        thickness (float or np.ndarray): thickness of the monoblocks (mm)
+        height (float or np.ndarray): height of the monoblocks (mm)
+        offset (float or np.ndarray): offset of the centre of the monoblocks
+            from their location, along their y direction (mm)
+    Returns:
+        np.ndarray, np.ndarray, np.ndarray: the (N, 2) centres, the
+            (N, 2, 2) unit axes and the (N, 2) half sizes of the rectangles
+    """
+    normals = placements["normals"][:, :2]
+    normals = normals / np.linalg.norm(normals, axis=1)[:, None]
+    # y direction of the monoblocks planes (normal x xDir with xDir = Z)
+    y_dirs = np.stack([normals[:, 1], -normals[:, 0]], axis=1)
+    half_sizes = np.broadcast_to(
+        np.stack(np.broadcast_arrays(thickness, height), axis=-1) / 2,
+        (len(normals), 2),
+    )
+    centres = placements["locations"][:, :2] + np.reshape(offset, (-1, 1)) * y_dirs
+    axes = np.stack([normals, y_dirs], axis=1)
+    return centres, axes, half_sizes
+
+
+def pair_clearances(footprints, first, second):
+    """Computes the clearance between pairs of footprints with the
+    separating axis theorem. The clearance is the largest separation of the
+    two rectangles along their axes: it is negative if and only if they
+    overlap.
+    Args:
+        footprints (tuple): centres, axes and half sizes (see footprints)
+        first (np.ndarray): (K,) indices of the first footprints
+        second (np.ndarray): (K,) indices of the second footprints
+    Returns:
+        np.ndarray: (K,) clearances (mm)
+    """
+    centres, axes, half_sizes = footprints
+    # axes (N, 2, 2) of each rectangle, scaled by its half sizes
+    half_axes = axes * half_sizes[:, :, None]
+
+    a, b = first, second
+    delta = centres[b] - centres[a]
+    # separating axes: the two axes of both rectangles, (K, 4, 2)
+    test_axes = np.concatenate([axes[a], axes[b]], axis=1)
+    projected_delta = np.abs(np.einsum("nkj,nj->nk", test_axes, delta))
+    radius_a = np.abs(np.einsum("nkj,nij->nki", test_axes, half_axes[a])).sum(axis=2)
+    radius_b = np.abs(np.einsum("nkj,nij->nki", test_axes, half_axes[b])).sum(axis=2)
+    return (projected_delta - radius_a - radius_b).max(axis=1)
+
+
+def close_pairs(centres, radii):
+    """Finds the pairs of discs that intersect, with a KD-tree if scipy is
+    available and by comparing all the pairs otherwise
+    Args:
+        centres (np.ndarray): (N, 2) centres of the discs
+        radii (np.ndarray): (N,) radii of the discs
+    Returns:
+        np.ndarray: (K, 2) indices i < j of the intersecting discs
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        first, second = np.triu_indices(len(centres), k=1)
+    else:
+        pairs = cKDTree(centres).query_pairs(2 * radii.max(), output_type="ndarray")
+        first, second = pairs[:, 0], pairs[:, 1]
+    distances = np.linalg.norm(centres[second] - centres[first], axis=1)
+    close = distances <= radii[first] + radii[second]
+    return np.sort(np.stack([first[close], second[close]], axis=1), axis=1)
+
+
+def interferences(placements, thickness, height, offset):
+    """Finds all the pairs of intersecting monoblocks, consecutive or not
+    (eg. at the junction between the straight and curved parts), without
+    building them. The pairs whose bounding circles intersect are found
+    with a spatial index (see close_pairs) and their oriented bounding boxes
+    are then tested with the separating axis theorem.
+    Args:
+        placements (dict): the placements (see plan_placements)
+        thickness (float or np.ndarray): thickness of the monoblocks (mm)
+        height (float or np.ndarray): height of the monoblocks (mm)
+        offset (float or np.ndarray): offset of the centre of the monoblocks
+            from their location, along their y direction (mm)
+    Returns:
+        np.ndarray: (K, 2) indices i < j of the intersecting monoblocks,
+            sorted
+    """
+    if len(placements["locations"]) < 2:
+        return np.zeros((0, 2), dtype=int)
+    rectangles = footprints(placements, thickness, height, offset)
+    centres, _, half_sizes = rectangles
+    pairs = close_pairs(centres, np.linalg.norm(half_sizes, axis=1))
+    pairs = pairs[pair_clearances(rectangles, pairs[:, 0], pairs[:, 1]) < 0]
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
@@ -0,0 +1,260 @@
+"""Parameter sweeps of the geometry.
+
+Each combination of a parameter grid is built in a worker process (a Target
+if nb_pfus is swept, a PFU otherwise) and the build time and the volume,
+mass, area and number of faces of each material are recorded in a table.
+The rows are appended to a CSV checkpoint file as soon as their case is
+done, so that an interrupted sweep resumes where it stopped. Failed cases
+are recorded with their error, their traceback is written to a log file
+and they are run again when the sweep is resumed.
+
+    python sweep.py sweep.csv --n-jobs 4 --grid L=0,44.2,88.4 angle=40,80
+    python sweep.py sweep.parquet --grid nb_pfus=1,3,5 w_thickness=0.5,1
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pfu import PFU, MATERIALS, DENSITIES
+from target import Target
+from parallel import nb_workers
+
+DEFAULTS = dict(
+    L=87.0,
+    target_radius=25.0,
+    angle=80,
+    thickness=1.2,
+    height=2.5,
+    width=2.3,
+    cucrzr_inner_radius=0.6,
+    cucrzr_thickness=0.15,
+    w_thickness=0.5,
+    cu_thickness=0.1,
+    gap=0.1,
+    toroidal_gap=0.2,
+)
+
+QUANTITIES = ["volume", "mass", "area", "faces"]
+
+
+def grid(**values):
+    """Creates the cases of a parameter grid
+    Args:
+        values: list of values of each parameter
+    Returns:
+        list: one dict of parameters per combination
+    """
+    names = list(values)
+    return [
+        dict(zip(names, combination))
+        for combination in itertools.product(*values.values())
+    ]
+
+
+def columns(names):
+    """Lists the columns of the table of a sweep
+    Args:
+        names (list): names of the swept parameters
+    Returns:
+        list: the columns
+    """
+    return (
+        list(names)
+        + ["status", "error", "build_time"]
+        + [
+            "{}_{}".format(material, quantity)
+            for material in MATERIALS
+            for quantity in QUANTITIES
+        ]
+    )
+
+
+def case_key(parameters, names):
+    """Identifies a case in the table of a sweep
+    Args:
+        parameters (dict): parameters of the case (values or their string
+            read from the CSV file)
+        names (list): names of the swept parameters
+    Returns:
+        tuple: the key
+    """
+    return tuple(str(parameters[name]) for name in names)
+
+
+def build_case(parameters, defaults=DEFAULTS):
+    """Builds a case of a sweep and measures its materials, to be run in a
+    worker process. The errors are caught and returned in the row.
+    Args:
+        parameters (dict): the swept parameters of the case
+        defaults (dict, optional): the other parameters. Defaults to
+            DEFAULTS.
+    Returns:
+        dict, str: the row of the case and the traceback of its error (None
+            if the case succeeded)
+    """
+    row = dict(parameters, status="ok", error="")
+    arguments = dict(defaults, **parameters)
+    try:
+        start = time.perf_counter()
+        if "nb_pfus" in arguments:
+            obj = Target(**arguments)
+        else:
+            arguments.pop("toroidal_gap", None)
+            obj = PFU(**arguments)
+        obj.build()
+        row["build_time"] = time.perf_counter() - start
+
+        for material in MATERIALS:
+            shapes = obj.get(material).vals()
+            volume = sum(shape.Volume() for shape in shapes)
+            row[material + "_volume"] = volume
+            row[material + "_mass"] = volume * DENSITIES[material]
+            row[material + "_area"] = sum(shape.Area() for shape in shapes)
+            row[material + "_faces"] = sum(len(shape.Faces()) for shape in shapes)
+    except Exception as e:
+        row.update(status="error", error=repr(e))
+        return row, traceback.format_exc()
+    return row, None
+
+
+def read_rows(filename):
+    """Reads the rows of a CSV checkpoint file
+    Args:
+        filename (str): the CSV file
+    Returns:
+        list: the rows (dicts of strings), empty if the file doesn't exist
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_table(rows, names, filename):
+    """Writes the table of a sweep to a CSV or Parquet file (depending on
+    the extension), the Parquet format requiring pyarrow
+    Args:
+        rows (list): the rows
+        names (list): names of the swept parameters
+        filename (str): the file
+    """
+    header = columns(names)
+    if os.path.splitext(filename)[1] != ".parquet":
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, header)
+            writer.writeheader()
+            writer.writerows(rows)
+        return
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("pyarrow is required to write parquet files") from e
+
+    table = {}
+    for column in header:
+        values = [row.get(column) for row in rows]
+        try:
+            values = [None if v in (None, "") else float(v) for v in values]
+        except (TypeError, ValueError):
+            values = [None if v is None else str(v) for v in values]
+        table[column] = values
+    pyarrow.parquet.write_table(pyarrow.table(table), filename)
+
+
+def run_sweep(cases, filename, n_jobs=1, defaults=DEFAULTS):
+    """Runs the cases of a sweep in a process pool. The rows are appended
+    to a CSV checkpoint file (filename itself if it is a CSV file) as soon
+    as their case is done and the cases already successful in the
+    checkpoint file are skipped. The tracebacks of the failed cases are
+    appended to <filename>.errors.log.
+    Args:
+        cases (list): parameters of each case (see grid), all the cases
+            having the same parameters
+        filename (str): the CSV or Parquet file of the table
+        n_jobs (int, optional): number of worker processes, -1 meaning all
+            the CPUs. Defaults to 1.
+        defaults (dict, optional): the parameters which are not swept.
+            Defaults to DEFAULTS.
+    Returns:
+        list: the rows of all the cases, in the order of cases
+    """
+    names = list(cases[0]) if cases else []
+    base, extension = os.path.splitext(filename)
+    checkpoint = filename if extension != ".parquet" else base + ".checkpoint.csv"
+    error_log = filename + ".errors.log"
+
+    rows = {case_key(row, names): row for row in read_rows(checkpoint)}
+    todo = [
+        case
+        for case in cases
+        if rows.get(case_key(case, names), {}).get("status") != "ok"
+    ]
+    if not os.path.exists(checkpoint):
+        write_table([], names, checkpoint)
+
+    def record(row, error):
+        rows[case_key(row, names)] = row
+        with open(checkpoint, "a", newline="") as f:
+            csv.DictWriter(f, columns(names)).writerow(row)
+        if error is not None:
+            with open(error_log, "a") as f:
+                f.write("{}\n{}\n".format(json.dumps(row, default=str), error))
+
+    if min(nb_workers(n_jobs), len(todo)) <= 1:
+        for case in todo:
+            record(*build_case(case, defaults))
+    else:
+        with ProcessPoolExecutor(max_workers=nb_workers(n_jobs)) as executor:
+            futures = {
+                executor.submit(build_case, case, defaults): case for case in todo
+            }
+            for future in as_completed(futures):
+                try:
+                    record(*future.result())
+                except Exception as e:
+                    # the worker process died (eg. crash in OCC)
+                    row = dict(futures[future], status="error", error=repr(e))
+                    record(row, traceback.format_exc())
+
+    table = [rows[case_key(case, names)] for case in cases]
+    if checkpoint != filename:
+        write_table(table, names, filename)
+    return table
+
+
+def parse_grid(arguments):
+    """Parses grid arguments of the form name=value1,value2
+    Args:
+        arguments (list): the arguments
+    Returns:
+        dict: the list of values of each parameter
+    """
+    values = {}
+    for argument in arguments:
+        name, _, text = argument.partition("=")
+        values[name] = [json.loads(value) for value in text.split(",")]
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("filename", help="CSV or Parquet file of the table")
+    parser.add_argument(
+        "--grid", nargs="+", required=True, help="parameters as name=value1,value2"
+    )
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    sweep_rows = run_sweep(
+        grid(**parse_grid(args.grid)), args.filename, n_jobs=args.n_jobs
+    )
+    nb_failed = sum(row["status"] != "ok" for row in sweep_rows)
+    print("{} cases, {} failed".format(len(sweep_rows), nb_failed))
@@ -1,63 +1,399 @@
 import cadquery as cq
-from pfu import PFU
+import numpy as np
+
+import os
+from pfu import PFU, MATERIALS, material_property, invalidated
+from fuse import fuse, compound
+from tracing import stage, count, add_hook, print_event
+from export import export_stl, tessellate, replicate, write_stl, translation_matrix
+from parallel import run, nb_workers, to_brep, from_brep, fuse_worker
+from transforms import to_location, moved, location_to_matrix
+
+# arguments of Target that are also passed to its PFU
+SHARED_ARGUMENTS = ["parallel_fuse", "fuse", "n_jobs", "cache"]
+
+# parameters and products each intermediate product of a target depends on
+# (see pfu.PFU_DEPENDENCIES), "pfu.<material>" being a material of the base
+# PFU. The base PFU itself is kept and updated with PFU.set_params.
+TARGET_DEPENDENCIES = dict(
+    pfus=["nb_pfus", "toroidal_gap", "width"]
+    + ["pfu.{}".format(material) for material in MATERIALS],
+    **{
+        material: ["nb_pfus", "toroidal_gap", "width", "fuse", "pfu." + material]
+        for material in MATERIALS
+    }
+)
 
 
 class Target:
-    def __init__(self, nb_pfus, toroidal_gap, **kwargs) -> None:
+    def __init__(
+        self,
+        nb_pfus,
+        toroidal_gap,
+        parallel_fuse=False,
+        fuse=True,
+        n_jobs=1,
+        cache=None,
+        location=None,
+        **kwargs
+    ) -> None:
+        """The materials of the target are only built on first access (or
+        with Target.build).
+        Args:
+            nb_pfus (int): number of PFUs
+            toroidal_gap (float): toroidal gap between two PFUs (mm)
+            parallel_fuse (bool, optional): if True, the OCC fuse operations
+                run in parallel mode. Defaults to False.
+            fuse (bool, optional): if False, nothing is fused and the
+                materials are compounds of the PFUs (themselves compounds of
+                the monoblocks). Defaults to True.
+            n_jobs (int, optional): number of worker processes used to build
+                the PFU and group the materials, -1 meaning all the CPUs.
+                Defaults to 1.
+            cache (GeometryCache, optional): if given, the grouped materials
+                are loaded from this cache when available and saved in it
+                otherwise. Defaults to None.
+            location (cq.Location, gp_Trsf or np.ndarray, optional):
+                placement of the target (see Target.place). Defaults to None.
+            kwargs: arguments passed to PFU
+        """
         self.nb_pfus = nb_pfus
         self.toroidal_gap = toroidal_gap
+        self.parallel_fuse = parallel_fuse
+        self.fuse = fuse
+        self.n_jobs = n_jobs
+        self.cache = cache
         self.pfu_args = kwargs
+        self.location = None if location is None else to_location(location)
+
+        self.solids = {}
+        self._pfus = None
+        self._base_pfu = None
+
+    tungsten = material_property("tungsten")
+    copper = material_property("copper")
+    tube = material_property("tube")
+    water = material_property("water")
+
+    @property
+    def pfus(self):
+        """PFUs of the target, created on first access"""
+        if self._pfus is None:
+            self._pfus = self.make_pfus()
+        return self._pfus
+
+    @property
+    def base_pfu(self):
+        """PFU from which the PFUs of the target are translated, created on
+        first access"""
+        if self._base_pfu is None:
+            self._base_pfu = PFU(
+                parallel_fuse=self.parallel_fuse,
+                fuse=self.fuse,
+                n_jobs=self.n_jobs,
+                cache=self.cache,
+                **self.pfu_args
+            )
+        return self._base_pfu
+
+    def get(self, material):
+        """Returns a material of the target, building it if needed. The
+        material is moved to the location of the target.
+        Args:
+            material (str): "tungsten", "copper", "tube" or "water"
+        Returns:
+            cq.Workplane: the material
+        """
+        if material not in self.solids:
+            self.build([material])
+        if self.location is None:
+            return self.solids[material]
+        return moved(self.solids[material], self.location)
+
+    def place(self, transformation):
+        """Moves the target. The transformation is composed with the current
+        location of the target and applied to the materials as a location:
+        their geometry is neither rebuilt nor copied.
+        Args:
+            transformation (cq.Location, gp_Trsf or np.ndarray): the
+                transformation, a (4, 4) matrix if an array
+        Returns:
+            Target: the target
+        """
+        location = to_location(transformation)
+        if self.location is not None:
+            location = location * self.location
+        self.location = location
+        return self
+
+    def set_params(self, **params):
+        """Changes arguments of the target or of its PFUs and invalidates
+        the intermediate products depending on them (see
+        TARGET_DEPENDENCIES). The base PFU is kept with its valid products
+        (see PFU.set_params): changing nb_pfus or toroidal_gap only groups
+        the translated PFUs again. The invalidated materials are built on
+        first access or with Target.rebuild.
+        Args:
+            params: arguments of Target or PFU, except location (see
+                Target.place)
+        Returns:
+            set: the invalidated products
+        """
+        changed = set()
+        pfu_params = {}
+        for name, value in params.items():
+            if name in ["nb_pfus", "toroidal_gap"] + SHARED_ARGUMENTS:
+                if getattr(self, name) != value:
+                    setattr(self, name, value)
+                    changed.add(name)
+                if name in SHARED_ARGUMENTS:
+                    pfu_params[name] = value
+            else:
+                if self.pfu_args.get(name) != value:
+                    changed.add(name)
+                self.pfu_args[name] = value
+                pfu_params[name] = value
+
+        pfu_products = self.base_pfu.set_params(**pfu_params)
+        changed.update("pfu." + product for product in pfu_products)
+        products = invalidated(TARGET_DEPENDENCIES, changed)
+        if "pfus" in products:
+            self._pfus = None
+        for material in MATERIALS:
+            if material in products:
+                self.solids.pop(material, None)
+        return products
+
+    def rebuild(self, materials=MATERIALS):
+        """Builds the materials invalidated by Target.set_params, reusing the
+        intermediate products that are still valid
+        Args:
+            materials (list, optional): materials to build.
+                Defaults to ["tungsten", "copper", "tube", "water"].
+        """
+        self.build(materials)
 
-        self.pfus = self.make_pfus()
+    def build(self, materials=MATERIALS):
+        """Builds the materials of the target that are not built yet
+        Args:
+            materials (list, optional): materials to build.
+                Defaults to ["tungsten", "copper", "tube", "water"].
+        """
+        missing = [material for material in materials if material not in self.solids]
+        if self.cache is not None:
+            for material in missing:
+                solids = self.cache.load(self.cache_key(material), [material])
+                if solids is not None:
+                    self.solids[material] = solids[material]
+            missing = [material for material in missing if material not in self.solids]
+        if len(missing) == 0:
+            return
 
-        print("grouping tungsten")
-        self.tungsten = self.pfus[0].tungsten
-        for pfu in self.pfus[1:]:
-            self.tungsten = self.tungsten.union(pfu.tungsten)
+        # fail before building anything if the monoblocks intersect
+        if self.base_pfu.validate and ("tungsten" in missing or "copper" in missing):
+            self.base_pfu.check_interferences()
+        groups = self.group_materials(missing)
+        for material, solid in groups.items():
+            self.solids[material] = solid
+            if self.cache is not None:
+                self.cache.save(self.cache_key(material), {material: solid})
 
-        print("grouping copper")
-        self.copper = self.pfus[0].copper
-        for pfu in self.pfus[1:]:
-            self.copper = self.copper.union(pfu.copper)
+    def properties(self):
+        """Computes the volume and mass of each material and the
+        plasma-facing area in closed form, without building any geometry
+        (see PFU.properties)
+        Returns:
+            dict: "volume" (mm3) and "mass" (g) of each material and
+                "plasma_facing_area" (mm2)
+        """
+        pfu_properties = self.base_pfu.properties()
+        return dict(
+            volume={
+                material: volume * self.nb_pfus
+                for material, volume in pfu_properties["volume"].items()
+            },
+            mass={
+                material: mass * self.nb_pfus
+                for material, mass in pfu_properties["mass"].items()
+            },
+            plasma_facing_area=pfu_properties["plasma_facing_area"] * self.nb_pfus,
+        )
 
-        print("grouping tube")
-        self.tube = self.pfus[0].tube
-        for pfu in self.pfus[1:]:
-            self.tube = self.tube.union(pfu.tube)
+    def geometry_parameters(self):
+        """Returns the arguments defining the geometry of the target
+        Returns:
+            dict: the arguments
+        """
+        return dict(
+            nb_pfus=self.nb_pfus,
+            toroidal_gap=self.toroidal_gap,
+            pfu=PFU(**self.pfu_args).geometry_parameters(),
+        )
 
-        print("grouping water")
-        self.water = self.pfus[0].water
-        for pfu in self.pfus[1:]:
-            self.water = self.water.union(pfu.water)
+    def cache_key(self, material):
+        """Computes the cache key of a material of the target
+        Args:
+            material (str): the material
+        Returns:
+            str: the key
+        """
+        return self.cache.key(
+            "Target",
+            dict(material=material, fuse=self.fuse, **self.geometry_parameters()),
+        )
 
-        print("done")
+    def to_assembly(self, name="target"):
+        """Creates an assembly of the target with one child per PFU named
+        pfu_<index>, each of them being the assembly of the PFU (see
+        PFU.to_assembly). The PFUs share the geometry of the base PFU and
+        the assembly is located at the location of the target.
+        Args:
+            name (str, optional): name of the assembly. Defaults to "target".
+        Returns:
+            cq.Assembly: the assembly
+        """
+        base_pfu = self.pfus[0].source[0]
+        pfu_assembly = base_pfu.to_assembly()
+        assembly = cq.Assembly(name=name, loc=self.location)
+        for i, pfu in enumerate(self.pfus):
+            _, vector = pfu.source
+            assembly.add(pfu_assembly, name="pfu_{}".format(i), loc=cq.Location(vector))
+        return assembly
+
+    def group_materials(self, materials):
+        """Groups several materials, in parallel worker processes if n_jobs
+        is greater than 1
+        Args:
+            materials (list): list of materials names
+        Returns:
+            dict: the fused workplane of each material
+        """
+        if not self.fuse or nb_workers(self.n_jobs) <= 1:
+            return {material: self.group(material) for material in materials}
+
+        pfu_solids = {
+            material: [to_brep(getattr(pfu, material)) for pfu in self.pfus]
+            for material in materials
+        }
+        with stage("fuse", material=", ".join(materials), nb_pfus=self.nb_pfus):
+            results = run(
+                fuse_worker,
+                [(pfu_solids[material], self.parallel_fuse) for material in materials],
+                n_jobs=self.n_jobs,
+            )
+            count("boolean", len(materials))
+        return {
+            material: from_brep(result) for material, result in zip(materials, results)
+        }
+
+    def group(self, material):
+        """Fuses a material of all the PFUs in a single operation
+        Args:
+            material (str): "tungsten", "copper", "tube" or "water"
+        Returns:
+            cq.Workplane: the fused material
+        """
+        solids = [getattr(pfu, material) for pfu in self.pfus]
+        if not self.fuse:
+            with stage("compound", material=material, nb_pfus=self.nb_pfus):
+                return compound(solids)
+        with stage("fuse", material=material, nb_pfus=self.nb_pfus) as fuse_stage:
+            fused = fuse(solids, parallel=self.parallel_fuse)
+            fuse_stage.set_shape(fused)
+        return fused
 
     def make_pfus(self):
-        mb_width = self.pfu_args["width"]
-        pfu_base = PFU(**self.pfu_args)
-        pfu_base.make_solid()
-        pfus = []
+        """Creates the PFUs of the target. A single PFU is built, the others
+        are translated copies of it. The materials of the PFUs are computed
+        on first access.
+        Returns:
+            list: the PFUs
+        """
+        return list(self.iter_pfus())
+
+    def iter_pfus(self):
+        """Yields the PFUs of the target one at a time. Unlike the pfus
+        attribute, the PFUs are not kept by the target: only the base PFU
+        (from which the others are translated) stays in memory.
+        Yields:
+            PFU: the PFUs
+        """
+        if self._pfus is not None:
+            yield from self._pfus
+            return
         for i in range(self.nb_pfus):
-            print("PFU {}".format(i + 1))
-            # loc = mb_width / 2 + i * (mb_width + self.toroidal_gap)
-            new_pfu = PFU(**self.pfu_args)
-            new_pfu.tungsten = pfu_base.tungsten.translate(
-                cq.Vector(0, 0, -i * (mb_width + self.toroidal_gap))
-            )
-            new_pfu.copper = pfu_base.copper.translate(
-                cq.Vector(0, 0, -i * (mb_width + self.toroidal_gap))
-            )
-            new_pfu.tube = pfu_base.tube.translate(
-                cq.Vector(0, 0, -i * (mb_width + self.toroidal_gap))
-            )
-            new_pfu.water = pfu_base.water.translate(
-                cq.Vector(0, 0, -i * (mb_width + self.toroidal_gap))
-            )
-            pfus.append(new_pfu)
-        return pfus
+            yield self.base_pfu.translated(self.pfu_translation(i))
+
+    def pfu_translation(self, i):
+        """Computes the translation of a PFU from the base PFU
+        Args:
+            i (int): index of the PFU
+        Returns:
+            cq.Vector: the translation vector
+        """
+        # loc = mb_width / 2 + i * (mb_width + self.toroidal_gap)
+        return cq.Vector(0, 0, -i * (self.pfu_args["width"] + self.toroidal_gap))
+
+    def stream(self, directory, formats=("brep",), materials=MATERIALS):
+        """Builds and writes the PFUs one at a time, each PFU being released
+        before the next one is created, so that the memory doesn't grow with
+        the number of PFUs. The materials are not grouped and the files are
+        named pfu_<index>_<material>.<format> (moved to the location of the
+        target). The meshes of the STL files are computed once, on the base
+        PFU, and translated for each PFU.
+        Args:
+            directory (str): the output directory
+            formats (tuple, optional): "brep", "step" and/or "stl".
+                Defaults to ("brep",).
+            materials (list, optional): materials to write.
+                Defaults to ["tungsten", "copper", "tube", "water"].
+        Yields:
+            int, dict: index of the PFU and the filename of each (material,
+                format)
+        """
+        for file_format in formats:
+            if file_format not in ["brep", "step", "stl"]:
+                raise ValueError("unknown format {}".format(file_format))
+        os.makedirs(directory, exist_ok=True)
+        location_matrix = np.eye(4)
+        if self.location is not None:
+            location_matrix = location_to_matrix(self.location)
+
+        meshes = {}
+        for i, pfu in enumerate(self.iter_pfus()):
+            filenames = {}
+            with stage("stream pfu", index=i):
+                for material in materials:
+                    name = os.path.join(directory, "pfu_{}_{}".format(i, material))
+                    if "stl" in formats:
+                        if material not in meshes:
+                            base_pfu = pfu if pfu.source is None else pfu.source[0]
+                            meshes[material] = tessellate(base_pfu.get(material))
+                        matrix = location_matrix @ translation_matrix(
+                            self.pfu_translation(i)
+                        )
+                        filenames[material, "stl"] = name + ".stl"
+                        write_stl(name + ".stl", replicate(*meshes[material], matrix))
+                    if "brep" not in formats and "step" not in formats:
+                        continue
+                    solid = pfu.get(material)
+                    if self.location is not None:
+                        solid = moved(solid, self.location)
+                    if "brep" in formats:
+                        filenames[material, "brep"] = name + ".brep"
+                        shapes = solid.vals()
+                        shape = (
+                            shapes[0] if len(shapes) == 1 else compound([solid]).val()
+                        )
+                        shape.exportBrep(name + ".brep")
+                    if "step" in formats:
+                        filenames[material, "step"] = name + ".step"
+                        cq.exporters.export(solid, name + ".step", exportType="STEP")
+            yield i, filenames
 
 
 if __name__ == "__main__":
+    add_hook(print_event)
     my_target = Target(
         nb_pfus=5,
         toroidal_gap=0.2,
@@ -70,7 +406,5 @@ if __name__ == "__main__":
         thickness_mb=1.2,
     )
 
-    cq.exporters.export(my_target.tungsten, "target_tungsten.stl")
-    cq.exporters.export(my_target.water, "target_water.stl")
-    cq.exporters.export(my_target.copper, "target_copper.stl")
-    cq.exporters.export(my_target.tube, "target_tube.stl")
+    for material in MATERIALS:
+        export_stl(my_target, material, "target_{}.stl".format(material))
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# the modules of the repository are flat, at the root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB_ARGS = dict(
+    thickness=1.2,
+    height=2.5,
+    width=2.3,
+    cucrzr_inner_radius=0.6,
+    cucrzr_thickness=0.15,
+    w_thickness=0.5,
+    cu_thickness=0.1,
+    gap=0.1,
+)
+
+
+@pytest.fixture
+def mb_args():
+    """Arguments of the monoblocks"""
+    return dict(MB_ARGS)
+
+
+@pytest.fixture
+def small_pfu_args():
+    """Arguments of a small PFU without interferences: L is a multiple of
+    thickness + gap"""
+    return dict(L=5.2, target_radius=25.0, angle=20, nb_mbs_on_curve=5, **MB_ARGS)
@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from centreline import Centreline
+
+SEGMENTS = [("line", 10), ("arc", 5, 90), ("arc", 8, -45), ("line", 3)]
+
+
+def test_edges_are_tangent():
+    edges = Centreline(SEGMENTS).edges()
+    for edge, next_edge in zip(edges[:-1], edges[1:]):
+        assert (edge.endPoint() - next_edge.startPoint()).Length == pytest.approx(
+            0, abs=1e-9
+        )
+        assert (edge.tangentAt(1) - next_edge.tangentAt(0)).Length == pytest.approx(
+            0, abs=1e-9
+        )
+
+
+def test_end_point():
+    end = Centreline(SEGMENTS).edges()[-1].endPoint()
+    # anticlockwise quarter of circle of centre (-5, 10) ending at (-5, 15),
+    # clockwise eighth of circle of centre (-5, 23), then a line along
+    # (-1, 1) / sqrt(2)
+    diagonal = math.sqrt(0.5)
+    x = -5 - 8 * diagonal - 3 * diagonal
+    y = 23 - 8 * diagonal + 3 * diagonal
+    assert (end.x, end.y, end.z) == pytest.approx((x, y, 0))
+
+
+def test_length():
+    centreline = Centreline(SEGMENTS)
+    assert centreline.length() == pytest.approx(
+        10 + 5 * math.pi / 2 + 8 * math.pi / 4 + 3
+    )
+
+
+@pytest.mark.parametrize(
+    "segments, rel",
+    [
+        (SEGMENTS, 1e-6),
+        # the surfaces swept along a spline are approximated
+        (
+            [("line", 5), ("spline", [(2, 10), (6, 12), (10, 12)]), ("arc", 10, -30)],
+            1e-4,
+        ),
+    ],
+)
+@pytest.mark.parametrize("inner_radius", [None, 0.6])
+def test_sweep_volume(segments, rel, inner_radius):
+    # the volume of a tube is the area of its profile times the length of
+    # its centreline, as long as the radius of curvature is larger than the
+    # radius of the profile
+    centreline = Centreline(segments)
+    solid = centreline.sweep(0.75, inner_radius).val()
+    area = math.pi * (0.75**2 - (inner_radius or 0) ** 2)
+    assert solid.isValid()
+    assert solid.Volume() == pytest.approx(area * centreline.length(), rel=rel)
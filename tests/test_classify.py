@@ -0,0 +1,59 @@
+import cadquery as cq
+import numpy as np
+import pytest
+from OCP.BRepClass3d import BRepClass3d_SolidClassifier
+from OCP.gp import gp_Pnt
+from OCP.TopAbs import TopAbs_IN
+
+from classify import MATERIAL_IDS, MaterialClassifier
+from target import Target
+from transforms import rotation, translation
+
+
+def occ_inside(shape, points):
+    """Same as Shape.isInside, reusing the classifier of the shape"""
+    classifier = BRepClass3d_SolidClassifier(shape.wrapped)
+    inside = np.zeros(len(points), dtype=bool)
+    for k, point in enumerate(points):
+        classifier.Perform(gp_Pnt(*point), 1e-9)
+        inside[k] = classifier.State() == TopAbs_IN
+    return inside
+
+
+@pytest.fixture
+def target(small_pfu_args):
+    target = Target(nb_pfus=2, toroidal_gap=0.2, **small_pfu_args)
+    target.place(translation((10, 0, 5)) * rotation((-1, 0, 0), (1, 0, 0), 90))
+    return target
+
+
+def test_classify_matches_occ(target):
+    # the cheapest materials first
+    shapes = {
+        material: target.get(material).val()
+        for material in ["water", "tube", "copper", "tungsten"]
+    }
+    box = cq.Compound.makeCompound(list(shapes.values())).BoundingBox()
+    rng = np.random.default_rng(0)
+    points = rng.uniform(
+        [box.xmin, box.ymin, box.zmin], [box.xmax, box.ymax, box.zmax], size=(3000, 3)
+    )
+
+    materials, pfu_indices, monoblock_indices = MaterialClassifier(target).classify(
+        points
+    )
+
+    expected = np.zeros(len(points), dtype=int)
+    for material, shape in shapes.items():
+        # the materials don't overlap, only the points not found yet are tested
+        todo = np.flatnonzero(expected == 0)
+        expected[todo[occ_inside(shape, points[todo])]] = MATERIAL_IDS[material]
+    assert (expected > 0).sum() > 100
+    assert materials.tolist() == expected.tolist()
+
+    in_monoblocks = np.isin(
+        materials, [MATERIAL_IDS["tungsten"], MATERIAL_IDS["copper"]]
+    )
+    assert np.all((pfu_indices >= 0) == (materials > 0))
+    assert np.all(pfu_indices < target.nb_pfus)
+    assert np.all((monoblock_indices >= 0) == in_monoblocks)
@@ -0,0 +1,122 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from dagmc import dagmc_model, dagmc_volumes, export_h5m
+from pfu import MATERIALS
+from target import Target
+
+
+def mesh_volume(vertices, triangles):
+    """Volume enclosed by a closed triangle mesh (divergence theorem)"""
+    v0, v1, v2 = (vertices[triangles[:, i]] for i in range(3))
+    return np.einsum("ij,ij->i", v0, np.cross(v1, v2)).sum() / 6
+
+
+@pytest.fixture
+def target(small_pfu_args):
+    return Target(nb_pfus=2, toroidal_gap=0.2, **small_pfu_args)
+
+
+def test_dagmc_volumes_match_occ_volumes(target):
+    volumes = dagmc_volumes(target, tolerance=0.01, angular_tolerance=0.05)
+    for material in MATERIALS:
+        faceted = sum(
+            mesh_volume(vertices, triangles)
+            for name, vertices, triangles in volumes
+            if name == material
+        )
+        expected = target.get(material).val().Volume()
+        assert faceted == pytest.approx(expected, rel=1e-2)
+
+
+def test_dagmc_volumes_count(target):
+    volumes = dagmc_volumes(target, per_monoblock=True)
+    nb_monoblocks = len(target.base_pfu.monoblock_placements())
+    names = [name for name, _, _ in volumes]
+    assert names.count("tungsten") == 2 * nb_monoblocks
+    assert names.count("tube") == 2
+
+
+def volume_triangles(model, volume):
+    """Triangles of the surfaces of a volume, oriented outwards"""
+    return np.concatenate(
+        [
+            triangles if senses[0] == volume else triangles[:, ::-1]
+            for triangles, senses in model["surfaces"]
+            if volume in senses
+        ]
+    )
+
+
+def test_dagmc_model_volumes_are_closed(target):
+    model = dagmc_model(target, tolerance=0.01, angular_tolerance=0.05)
+    vertices = model["vertices"]
+    volumes = {material: 0 for material in MATERIALS}
+    for volume, material in enumerate(model["materials"]):
+        triangles = volume_triangles(model, volume)
+        # each edge is shared by two triangles, in opposite directions
+        edges = Counter(
+            map(
+                tuple,
+                np.concatenate([triangles[:, [i, (i + 1) % 3]] for i in range(3)]),
+            )
+        )
+        assert all(n == 1 and edges[(b, a)] == 1 for (a, b), n in edges.items())
+        volumes[material] += mesh_volume(vertices, triangles)
+    for material in MATERIALS:
+        expected = target.get(material).val().Volume()
+        assert volumes[material] == pytest.approx(expected, rel=1e-2)
+
+
+def test_dagmc_model_shares_interfaces(target):
+    model = dagmc_model(target)
+    materials = model["materials"]
+    interfaces = {
+        tuple(sorted(materials[volume] for volume in senses))
+        for _, senses in model["surfaces"]
+        if (senses >= 0).all()
+    }
+    assert {("tube", "water"), ("copper", "tube"), ("copper", "tungsten")} <= interfaces
+    # the second PFU has the surfaces of the first one, with its own volumes
+    nb_surfaces = len(model["surfaces"]) // 2
+    nb_volumes = len(materials) // 2
+    for (_, senses), (_, copy_senses) in zip(
+        model["surfaces"][:nb_surfaces], model["surfaces"][nb_surfaces:]
+    ):
+        assert (
+            copy_senses.tolist()
+            == np.where(senses >= 0, senses + nb_volumes, -1).tolist()
+        )
+
+
+def test_write_h5m(tmp_path, small_pfu_args):
+    pytest.importorskip("pymoab")
+    from pymoab import core, types
+
+    target = Target(nb_pfus=1, toroidal_gap=0.2, **small_pfu_args)
+    model = dagmc_model(target)
+    filename = str(tmp_path / "dagmc.h5m")
+    export_h5m(target, filename)
+
+    moab_core = core.Core()
+    moab_core.load_file(filename)
+    category_tag = moab_core.tag_get_handle(types.CATEGORY_TAG_NAME)
+    name_tag = moab_core.tag_get_handle(types.NAME_TAG_NAME)
+
+    def entity_sets(category):
+        return moab_core.get_entities_by_type_and_tag(
+            0, types.MBENTITYSET, [category_tag], [category]
+        )
+
+    def name(group):
+        value = moab_core.tag_get_data(name_tag, group, flat=True)[0]
+        if isinstance(value, bytes):
+            value = value.decode()
+        return str(value).rstrip("\x00")
+
+    assert len(entity_sets("Volume")) == len(model["materials"])
+    assert len(entity_sets("Surface")) == len(model["surfaces"])
+    group_names = {name(group) for group in entity_sets("Group")}
+    assert group_names == {"mat:{}".format(material) for material in MATERIALS}
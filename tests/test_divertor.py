@@ -0,0 +1,50 @@
+from functools import partial
+
+import pytest
+
+import tracing
+from divertor import Divertor
+from pfu import MATERIALS
+from target import Target
+from transforms import translation
+
+
+def build_target(pfu_args, location):
+    target = Target(2, 0.2, location=translation(location), **pfu_args)
+    return target.tungsten, target.copper, target.tube, target.water
+
+
+def build(pfu_args, n_jobs):
+    """Builds a divertor of two targets and records its events"""
+    divertor = Divertor(
+        {
+            "first": partial(build_target, pfu_args, (0, 0, 0)),
+            "second": partial(build_target, pfu_args, (50, 0, 0)),
+        },
+        n_jobs=n_jobs,
+    )
+    recorder = tracing.TraceRecorder()
+    tracing.add_hook(recorder)
+    try:
+        divertor.build()
+    finally:
+        tracing.remove_hook(recorder)
+    return divertor, recorder
+
+
+def test_parallel_build_matches_serial_build(small_pfu_args):
+    serial, serial_recorder = build(small_pfu_args, n_jobs=1)
+    parallel, parallel_recorder = build(small_pfu_args, n_jobs=2)
+    for material in MATERIALS:
+        assert parallel.get(material).val().Volume() == pytest.approx(
+            serial.get(material).val().Volume()
+        )
+
+    # the events of the worker processes are replayed in the main process
+    serial_summary = serial_recorder.summary()
+    parallel_summary = parallel_recorder.summary()
+    assert parallel_summary.keys() == serial_summary.keys()
+    for name, entry in serial_summary.items():
+        assert parallel_summary[name]["calls"] == entry["calls"]
+        assert parallel_summary[name]["counters"] == entry["counters"]
+    assert parallel_summary["divertor build"]["counters"]["boolean"] > 0
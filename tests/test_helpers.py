@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pytest
+
+from helpers import (
+    angle_between_two_points_on_circle,
+    angles_between_points_on_circles,
+    distance_between_two_points,
+    distances_between_points,
+    find_center_point_of_circle,
+    find_center_points_of_circles,
+    find_radii_of_circles,
+    find_radius_of_circle,
+)
+
+
+@pytest.fixture
+def triplets():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-100, 100, size=(3, 1000, 2))
+    # collinear triplets
+    points[2, :10] = 2 * points[1, :10] - points[0, :10]
+    return points
+
+
+def test_find_center_points_of_circles(triplets):
+    centers = find_center_points_of_circles(*triplets)
+    assert centers.shape == (1000, 2)
+    for k, center in enumerate(centers):
+        expected = find_center_point_of_circle(*(tuple(p[k]) for p in triplets))
+        if expected is None:
+            assert center.mask.all()
+        else:
+            assert not center.mask.any()
+            assert center.data == pytest.approx(expected)
+    assert centers.mask[:10].all()
+
+
+def test_distances_between_points(triplets):
+    distances = distances_between_points(triplets[0], triplets[1])
+    expected = [
+        distance_between_two_points(a, b) for a, b in zip(triplets[0], triplets[1])
+    ]
+    assert distances == pytest.approx(expected)
+
+
+def test_find_radii_of_circles(triplets):
+    centers = find_center_points_of_circles(*triplets)
+    radii = find_radii_of_circles(centers, triplets[0])
+    assert radii.mask[:10].all()
+    for k in range(10, 1000):
+        expected = find_radius_of_circle(tuple(centers.data[k]), tuple(triplets[0, k]))
+        assert radii[k] == pytest.approx(expected)
+
+    # the center and the edge point coincide
+    radius = find_radii_of_circles(np.zeros(2), np.zeros(2))
+    assert radius == np.inf
+
+
+def test_angles_between_points_on_circles(triplets):
+    centers = find_center_points_of_circles(*triplets)
+    radii = find_radii_of_circles(centers, triplets[0])
+    angles = angles_between_points_on_circles(triplets[0], triplets[1], radii)
+    assert angles.mask[:10].all()
+    for k in range(10, 1000):
+        expected = angle_between_two_points_on_circle(
+            tuple(triplets[0, k]), tuple(triplets[1, k]), radii[k]
+        )
+        assert angles[k] == pytest.approx(expected)
+
+
+def test_angles_between_points_further_than_diameter():
+    angles = angles_between_points_on_circles(
+        np.array([[0, 0], [0, 0]]), np.array([[1, 0], [3, 0]]), np.array([1, 1])
+    )
+    assert angles[0] == pytest.approx(math.pi / 3)
+    assert angles.mask.tolist() == [False, True]
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from mesh import merge_nodes, monoblock_placement_matrices, replicate_mesh
+from monoblock import Monoblock
+from pfu import PFU
+
+
+def tetrahedra_volume(nodes, tetrahedra):
+    """Total volume of tetrahedra"""
+    v0, v1, v2, v3 = (nodes[tetrahedra[:, i]] for i in range(4))
+    return np.abs(np.einsum("ij,ij->i", v1 - v0, np.cross(v2 - v0, v3 - v0))).sum() / 6
+
+
+def boundary_faces(cells):
+    """Triangles belonging to a single tetrahedron (sorted node indices)"""
+    tetrahedra = np.concatenate(list(cells.values()))
+    faces = np.concatenate(
+        [tetrahedra[:, face] for face in [[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]]]
+    )
+    faces, counts = np.unique(np.sort(faces, axis=1), axis=0, return_counts=True)
+    return faces[counts == 1]
+
+
+def translations(nb, pitch):
+    matrices = np.tile(np.eye(4), (nb, 1, 1))
+    matrices[:, 2, 3] = np.arange(nb) * pitch
+    return matrices
+
+
+def test_replicate_mesh():
+    nodes = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+    cells = {"cucrzr": np.array([[0, 1, 2, 3]])}
+    placed_nodes, placed_cells = replicate_mesh(nodes, cells, translations(3, 2.0))
+    assert placed_nodes.shape == (12, 3)
+    assert np.allclose(placed_nodes[8:], nodes + [0, 0, 4.0])
+    assert placed_cells["cucrzr"].tolist() == [
+        [0, 1, 2, 3],
+        [4, 5, 6, 7],
+        [8, 9, 10, 11],
+    ]
+
+
+def test_merge_nodes_across_grid_cells():
+    # on either side of a boundary of the grid of spacing tolerance
+    nodes = np.array([[0.49e-6, 0, 0], [0.51e-6, 0, 0], [1, 0, 0], [0, 1, 0]])
+    cells = {"cucrzr": np.array([[0, 2, 3, 3], [1, 2, 3, 3]])}
+    merged_nodes, merged_cells = merge_nodes(nodes, cells, tolerance=1e-6)
+    assert len(merged_nodes) == 3
+    assert merged_cells["cucrzr"][0].tolist() == merged_cells["cucrzr"][1].tolist()
+
+
+def test_straight_monoblocks_mesh_is_conforming(mb_args):
+    pytest.importorskip("gmsh")
+    from mesh import mesh_monoblock
+
+    monoblock = Monoblock(**mb_args, hollow=True)
+    nodes, cells = mesh_monoblock(monoblock, size=0.3)
+    pitch = mb_args["thickness"] + mb_args["gap"]
+
+    # the end annuli of the CuCrZr have the same nodes, up to the pitch
+    start = nodes[np.abs(nodes[:, 2] + pitch / 2) < 1e-9]
+    end = nodes[np.abs(nodes[:, 2] - pitch / 2) < 1e-9]
+    assert len(start) == len(end) > 0
+    assert np.allclose(
+        np.unique(start[:, :2].round(9), axis=0), np.unique(end[:, :2].round(9), axis=0)
+    )
+
+    placed_nodes, placed_cells = replicate_mesh(nodes, cells, translations(3, pitch))
+    merged_nodes, merged_cells = merge_nodes(placed_nodes, placed_cells)
+    assert len(merged_nodes) == len(placed_nodes) - 2 * len(end)
+
+    # no crack: the interfaces between the monoblocks are not on the boundary
+    faces = boundary_faces(merged_cells)
+    for z in [pitch / 2, 3 * pitch / 2]:
+        on_interface = np.abs(merged_nodes[faces][:, :, 2] - z) < 1e-9
+        assert not on_interface.all(axis=1).any()
+
+    for material, tetrahedra in merged_cells.items():
+        assert tetrahedra_volume(merged_nodes, tetrahedra) == pytest.approx(
+            3 * tetrahedra_volume(nodes, cells[material])
+        )
+
+
+def test_mesh_pfu(small_pfu_args):
+    pytest.importorskip("gmsh")
+    sparse = pytest.importorskip("scipy.sparse")
+    from scipy.sparse.csgraph import connected_components
+    from mesh import mesh_pfu
+
+    pfu = PFU(**small_pfu_args)
+    with pytest.warns(UserWarning, match="curved part are not connected"):
+        nodes, cells = mesh_pfu(pfu, size=0.3)
+
+    expected = {material: 0 for material in cells}
+    for kwargs, matrices in monoblock_placement_matrices(pfu):
+        monoblock = Monoblock(**dict(kwargs, hollow=True))
+        for material in expected:
+            volume = getattr(monoblock, material).val().Volume()
+            expected[material] += len(matrices) * volume
+    for material, tetrahedra in cells.items():
+        # the faceted hole of the coarse tungsten mesh is a little too small
+        assert tetrahedra_volume(nodes, tetrahedra) == pytest.approx(
+            expected[material], rel=2e-2
+        )
+
+    # the monoblocks of the straight part are a single connected mesh, each
+    # monoblock of the curved part is on its own
+    tetrahedra = np.concatenate(list(cells.values()))
+    incidence = sparse.coo_matrix(
+        (
+            np.ones(tetrahedra.size),
+            (np.repeat(np.arange(len(tetrahedra)), 4), tetrahedra.ravel()),
+        ),
+        shape=(len(tetrahedra), len(nodes)),
+    )
+    nb_components, _ = connected_components(incidence @ incidence.T, directed=False)
+    assert nb_components == pfu.nb_mbs_on_curve + 1
@@ -0,0 +1,93 @@
+import sys
+
+import numpy as np
+import pytest
+
+import tracing
+from helpers import (
+    angle_between_two_points_on_circle,
+    find_center_point_of_circle,
+    find_radius_of_circle,
+)
+from pfu import PFU
+from placement import close_pairs, nb_monoblocks_on_curve
+
+
+def dome_geometry():
+    """L, target_radius and angle of the PFUs of the dome (see
+    create_geometry.make_dome)"""
+    a, b = (-33, 0), (33, 0)
+    radius = find_radius_of_circle(find_center_point_of_circle(a, b, (0, 10)), a)
+    angle = angle_between_two_points_on_circle(a, b, radius)
+    return dict(L=0, target_radius=radius, angle=np.degrees(angle))
+
+
+def test_junction_interference(small_pfu_args):
+    pfu = PFU(**dict(small_pfu_args, L=5.0))
+    assert pfu.interferences().tolist() == [[3, 4]]
+    assert pfu.plan()["curved"][[3, 4]].tolist() == [False, True]
+
+
+def test_curve_interferences(small_pfu_args):
+    pfu = PFU(**dict(small_pfu_args, nb_mbs_on_curve=12))
+    assert nb_monoblocks_on_curve(25.0, 20, 1.2, 0.1) == 7
+    assert pfu.interferences().tolist() == [[i, i + 1] for i in range(4, 15)]
+
+
+@pytest.mark.parametrize("target_radius", [3, 5, 10, 25, 60])
+@pytest.mark.parametrize("angle", [20, 80, 170])
+def test_automatic_nb_mbs_on_curve(mb_args, target_radius, angle):
+    pfu = PFU(L=0, target_radius=target_radius, angle=angle, **mb_args)
+    assert pfu.interferences().shape == (0, 2)
+
+
+def test_nb_mbs_on_curve_small_radius(mb_args):
+    # 6 monoblocks are spaced by more than thickness + gap on the centreline
+    # but their sides get closer towards the centre of curvature
+    assert nb_monoblocks_on_curve(5, 80, 1.2, 0.1) == 6
+    pfu = PFU(L=0, target_radius=5, angle=80, **mb_args)
+    assert pfu.nb_mbs_on_curve == 5
+    crowded = PFU(L=0, target_radius=5, angle=80, nb_mbs_on_curve=6, **mb_args)
+    assert len(crowded.interferences()) > 0
+    with pytest.raises(ValueError, match=r"on the curved part.*at most 5\)"):
+        crowded.check_interferences()
+
+
+@pytest.mark.parametrize(
+    "geometry",
+    [
+        dict(L=5.2, target_radius=25.0, angle=20, nb_mbs_on_curve=5),
+        dict(L=87.0, target_radius=25.0, angle=80),
+        dict(L=87.0, target_radius=50, angle=90, nb_mbs_on_curve=60),
+        dict(dome_geometry(), nb_mbs_on_curve=54),
+    ],
+)
+def test_no_interferences(mb_args, geometry):
+    pfu = PFU(**geometry, **mb_args)
+    assert pfu.interferences().shape == (0, 2)
+
+
+def test_close_pairs_without_scipy(monkeypatch):
+    rng = np.random.default_rng(0)
+    centres = rng.uniform(0, 10, size=(200, 2))
+    radii = rng.uniform(0.1, 0.5, size=200)
+    expected = close_pairs(centres, radii)
+    assert len(expected) > 0
+
+    monkeypatch.setitem(sys.modules, "scipy.spatial", None)
+    pairs = close_pairs(centres, radii)
+    assert sorted(map(tuple, pairs)) == sorted(map(tuple, expected))
+
+
+def test_build_fails_before_building(small_pfu_args):
+    pfu = PFU(**dict(small_pfu_args, L=5.0))
+    booleans = tracing.counters.get("boolean", 0)
+    with pytest.raises(ValueError, match=r"\[\[3, 4\]\].*junction.*multiple"):
+        pfu.build()
+    assert tracing.counters.get("boolean", 0) == booleans
+
+
+def test_build_without_validation(small_pfu_args):
+    pfu = PFU(**dict(small_pfu_args, L=5.0), validate=False)
+    with pytest.warns(UserWarning, match="intersect"):
+        pfu.build()
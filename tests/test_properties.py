@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from monoblock import Monoblock, centre_offset
+from pfu import MATERIALS, PFU
+from target import Target
+
+
+def occ_volume(workplane):
+    return sum(shape.Volume() for shape in workplane.vals())
+
+
+def check_volumes(properties, shapes):
+    """Compares the closed form volumes with the volumes of the shapes"""
+    for material, workplane in shapes.items():
+        # the cut of the copper by the curved tube is approximated
+        rel = 1e-2 if material == "copper" else 1e-6
+        assert properties["volume"][material] == pytest.approx(
+            occ_volume(workplane), rel=rel
+        )
+
+
+def plasma_facing_faces_area(tungsten, frames):
+    """Area of the plasma-facing faces of the tungsten of monoblocks, at
+    cucrzr_inner_radius + cucrzr_thickness + cu_thickness + w_thickness from
+    their location, opposite to their y direction
+    Args:
+        tungsten (cq.Workplane): the tungsten
+        frames (list): location, y direction and arguments of each monoblock
+    """
+    area = 0
+    for face in tungsten.faces().vals():
+        centre = np.array(face.Center().toTuple())
+        normal = np.array(face.normalAt().toTuple())
+        for location, y_dir, args in frames:
+            distance = args["height"] / 2 - centre_offset(**args)
+            if np.dot(normal, -y_dir) > 1 - 1e-9 and np.isclose(
+                np.dot(centre - location, -y_dir), distance
+            ):
+                area += face.Area()
+                break
+    return area
+
+
+def pfu_frames(pfu, translation=(0, 0, 0)):
+    frames = []
+    for placement in pfu.monoblock_placements():
+        y_dir = np.cross(placement["normal"], placement["xDir"])
+        location = np.add(placement["location"], translation)
+        frames.append((location, y_dir / np.linalg.norm(y_dir), placement))
+    return frames
+
+
+@pytest.mark.parametrize("hollow", [True, False])
+def test_monoblock_properties(mb_args, hollow):
+    monoblock = Monoblock(**mb_args, hollow=hollow)
+    shapes = {
+        material: getattr(monoblock, material)
+        for material in ["tungsten", "copper", "cucrzr"]
+    }
+    check_volumes(monoblock.properties(), shapes)
+
+    frame = (
+        np.array(monoblock.plane.origin.toTuple()),
+        np.array(monoblock.plane.yDir.toTuple()),
+        mb_args,
+    )
+    assert monoblock.properties()["plasma_facing_area"] == pytest.approx(
+        plasma_facing_faces_area(monoblock.tungsten, [frame])
+    )
+
+
+@pytest.mark.parametrize("L", [0, 5.2])
+@pytest.mark.parametrize("tube_method", ["boolean", "sweep"])
+def test_pfu_properties(small_pfu_args, L, tube_method):
+    pfu = PFU(**dict(small_pfu_args, L=L), tube_method=tube_method)
+    shapes = {material: pfu.get(material) for material in MATERIALS}
+    check_volumes(pfu.properties(), shapes)
+    assert pfu.properties()["plasma_facing_area"] == pytest.approx(
+        plasma_facing_faces_area(pfu.get("tungsten"), pfu_frames(pfu))
+    )
+
+
+def test_target_properties(small_pfu_args):
+    target = Target(nb_pfus=2, toroidal_gap=0.2, **small_pfu_args)
+    shapes = {material: target.get(material) for material in MATERIALS}
+    check_volumes(target.properties(), shapes)
+
+    # the PFUs are translated by -i * pitch along Z
+    pitch = small_pfu_args["width"] + target.toroidal_gap
+    frames = [
+        frame
+        for i in range(target.nb_pfus)
+        for frame in pfu_frames(target.base_pfu, (0, 0, -i * pitch))
+    ]
+    assert target.properties()["plasma_facing_area"] == pytest.approx(
+        plasma_facing_faces_area(target.get("tungsten"), frames)
+    )
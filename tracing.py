@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+_hooks = []
+_active_stages = threading.local()
+counters = {}
+
+
+def add_hook(hook):
+    """Registers a function called with each event emitted at the end of a
+    stage
+    Args:
+        hook (callable): function taking the event (dict) as argument
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Unregisters a hook
+    Args:
+        hook (callable): the hook
+    """
+    _hooks.remove(hook)
+
+
+def current_rss():
+    """Returns the resident set size of the process
+    Returns:
+        float: the RSS (MB)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, AttributeError):
+        pass
+    # not on Linux, fall back to the peak RSS where resource is available
+    # (Unix only)
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count(counter, n=1):
+    """Increments a counter (eg. "boolean" for OCC boolean operations) of
+    all the active stages and of the global counters
+    Args:
+        counter (str): name of the counter
+        n (int, optional): increment. Defaults to 1.
+    """
+    counters[counter] = counters.get(counter, 0) + n
+    for stage_event in getattr(_active_stages, "stack", []):
+        stage_counters = stage_event["counters"]
+        stage_counters[counter] = stage_counters.get(counter, 0) + n
+
+
+class Stage:
+    def __init__(self, event) -> None:
+        """Handle of an active stage"""
+        self.event = event
+
+    def set_shape(self, workplane):
+        """Records the number of faces and edges of the shape produced by
+        the stage. Nothing is computed if no hook is registered.
+        Args:
+            workplane (cq.Workplane): the shape
+        """
+        if not _hooks:
+            return
+        shapes = workplane.vals()
+        self.event["faces"] = sum(len(shape.Faces()) for shape in shapes)
+        self.event["edges"] = sum(len(shape.Edges()) for shape in shapes)
+
+
+@contextmanager
+def stage(name, **attributes):
+    """Context manager timing a stage of the construction. At the end of the
+    stage, an event is sent to the registered hooks with the keys name,
+    attributes, start (s), duration (s), rss_delta (MB), counters and
+    optionally faces and edges (see Stage.set_shape).
+    Args:
+        name (str): name of the stage (eg. "tube cut")
+        attributes: additional information on the stage (eg. material)
+    Yields:
+        Stage: handle of the stage
+    """
+    event = {
+        "name": name,
+        "attributes": attributes,
+        "counters": {},
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if not hasattr(_active_stages, "stack"):
+        _active_stages.stack = []
+    _active_stages.stack.append(event)
+    start_rss = current_rss() if _hooks else 0
+    event["start"] = time.perf_counter()
+    try:
+        yield Stage(event)
+    finally:
+        event["duration"] = time.perf_counter() - event["start"]
+        _active_stages.stack.pop()
+        if _hooks:
+            event["rss_delta"] = current_rss() - start_rss
+            for hook in list(_hooks):
+                hook(event)
+
+
+@contextmanager
+def record():
+    """Context manager recording the events of a block of code instead of
+    sending them to the registered hooks, eg. in a worker process whose
+    events are then replayed in the main process (see replay)
+    Yields:
+        dict: "events" (list) emitted during the block and "counters" (dict)
+            increments of the global counters during the block, filled at
+            the end of the block
+    """
+    recorder = TraceRecorder()
+    hooks = list(_hooks)
+    _hooks[:] = [recorder]
+    start_counters = dict(counters)
+    recorded = {"events": recorder.events, "counters": {}}
+    try:
+        yield recorded
+    finally:
+        _hooks[:] = hooks
+        for counter, value in counters.items():
+            if value != start_counters.get(counter, 0):
+                recorded["counters"][counter] = value - start_counters.get(counter, 0)
+
+
+def replay(recorded):
+    """Sends events recorded in another process (see record) to the
+    registered hooks and adds their counters to the global counters and to
+    the active stages
+    Args:
+        recorded (dict): the recorded events and counters
+    """
+    for counter, n in recorded["counters"].items():
+        count(counter, n)
+    for event in recorded["events"]:
+        for hook in list(_hooks):
+            hook(event)
+
+
+def print_event(event):
+    """Hook printing the events"""
+    attributes = ", ".join(
+        "{}={}".format(key, value) for key, value in event["attributes"].items()
+    )
+    print(
+        "{} ({}) {:.3f} s {}".format(
+            event["name"], attributes, event["duration"], event["counters"]
+        )
+    )
+
+
+class TraceRecorder:
+    def __init__(self) -> None:
+        """Hook recording the events, that can be written as a Chrome trace
+        (to be opened with chrome://tracing or https://ui.perfetto.dev)
+        """
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def summary(self):
+        """Aggregates the events by stage name
+        Returns:
+            dict: number of occurrences, total duration (s) and counters of
+                each stage name
+        """
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(
+                event["name"], {"calls": 0, "duration": 0.0, "counters": {}}
+            )
+            entry["calls"] += 1
+            entry["duration"] += event["duration"]
+            for counter, value in event["counters"].items():
+                entry["counters"][counter] = entry["counters"].get(counter, 0) + value
+        return summary
+
+    def write_chrome_trace(self, filename):
+        """Writes the events in the Chrome trace event format
+        Args:
+            filename (str): the JSON file
+        """
+        trace_events = []
+        for event in self.events:
+            args = dict(event["attributes"], **event["counters"])
+            for key in ["faces", "edges", "rss_delta"]:
+                if key in event:
+                    args[key] = event[key]
+            trace_events.append(
+                {
+                    "name": event["name"],
+                    "ph": "X",
+                    "ts": event["start"] * 1e6,
+                    "dur": event["duration"] * 1e6,
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "args": args,
+                }
+            )
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace_events}, f, default=str)
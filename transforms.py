@@ -0,0 +1,81 @@
+import cadquery as cq
+from OCP.gp import gp_Ax1, gp_Trsf
+import numpy as np
+
+from math import radians
+
+
+def translation(vector):
+    """Creates the location of a translation
+    Args:
+        vector (tuple or cq.Vector): the translation vector
+    Returns:
+        cq.Location: the location
+    """
+    return cq.Location(cq.Vector(vector))
+
+
+def rotation(start, end, angle):
+    """Creates the location of a rotation around an axis, with the same
+    arguments as cq.Shape.rotate
+    Args:
+        start (tuple or cq.Vector): start point of the axis
+        end (tuple or cq.Vector): end point of the axis
+        angle (float): angle of the rotation (deg)
+    Returns:
+        cq.Location: the location
+    """
+    start, end = cq.Vector(start), cq.Vector(end)
+    transformation = gp_Trsf()
+    transformation.SetRotation(
+        gp_Ax1(start.toPnt(), (end - start).toDir()), radians(angle)
+    )
+    return cq.Location(transformation)
+
+
+def to_location(transformation):
+    """Converts a transformation to a location
+    Args:
+        transformation (cq.Location, gp_Trsf or np.ndarray): the
+            transformation, a (4, 4) or (3, 4) matrix if an array
+    Returns:
+        cq.Location: the location
+    """
+    if isinstance(transformation, cq.Location):
+        return transformation
+    if isinstance(transformation, gp_Trsf):
+        return cq.Location(transformation)
+    matrix = np.asarray(transformation, dtype=float)
+    if matrix.shape not in [(4, 4), (3, 4)]:
+        raise ValueError("expected a (4, 4) matrix, got {}".format(matrix.shape))
+    trsf = gp_Trsf()
+    trsf.SetValues(*matrix[:3].flatten())
+    return cq.Location(trsf)
+
+
+def location_to_matrix(location):
+    """Converts a location to a 4x4 transformation matrix
+    Args:
+        location (cq.Location): the location
+    Returns:
+        np.ndarray: the (4, 4) matrix
+    """
+    transformation = location.wrapped.Transformation()
+    matrix = np.eye(4)
+    for i in range(3):
+        for j in range(4):
+            matrix[i, j] = transformation.Value(i + 1, j + 1)
+    return matrix
+
+
+def moved(workplane, location):
+    """Moves the shapes of a workplane to a new location without copying
+    their geometry
+    Args:
+        workplane (cq.Workplane): the shapes
+        location (cq.Location): the location, applied on top of the current
+            location of the shapes
+    Returns:
+        cq.Workplane: the moved shapes
+    """
+    return workplane.newObject([obj.moved(location) for obj in workplane.vals()])